@@ -1,36 +1,399 @@
+import asyncio
 import httpx
-from config import OPENROUTER_API_KEY
+import json
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional, AsyncIterator, Awaitable, Callable
+from llm_cache import LLMCache, request_fingerprint
+from singleflight import SingleFlight
+from config import (
+    OPENROUTER_API_KEY, OPENROUTER_BASE_URL, OPENROUTER_HTTP2,
+    OPENROUTER_MAX_CONNECTIONS, OPENROUTER_MAX_KEEPALIVE_CONNECTIONS,
+    OPENROUTER_KEEPALIVE_EXPIRY, OPENROUTER_CONNECT_TIMEOUT,
+    OPENROUTER_TEXT_TIMEOUT, OPENROUTER_OUTLINE_TIMEOUT, OPENROUTER_SECTION_TIMEOUT,
+    OPENROUTER_REFINE_TIMEOUT, OPENROUTER_DOCUMENT_TIMEOUT,
+    LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_RETRY_AFTER_MAX
+)
+
+try:
+    import h2  # noqa: F401 - HTTP/2 support is optional in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Transient upstream statuses worth retrying
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+class OpenRouterError(Exception):
+    """Upstream failure, with enough detail for the scheduler to decide on a retry"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def status_error(status_code: int, detail: str, headers: httpx.Headers) -> OpenRouterError:
+    return OpenRouterError(
+        f"OpenRouter API error: {status_code} - {detail}",
+        status_code=status_code,
+        retry_after=parse_retry_after(headers.get('retry-after')),
+        retryable=status_code in RETRYABLE_STATUS_CODES
+    )
+
+def parse_batch_response(text: str, count: int) -> dict:
+    """Parse a batched completion into {index: content} for indices 0..count-1.
+    
+    The model is asked for a JSON object keyed by 1-based section number. Code
+    fences and surrounding chatter are tolerated; entries that are missing, out of
+    range or empty are dropped so the caller can regenerate them individually.
+    """
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    
+    contents = {}
+    for key, value in data.items():
+        try:
+            index = int(str(key).strip()) - 1
+        except ValueError:
+            continue
+        if 0 <= index < count and isinstance(value, str) and value.strip():
+            contents[index] = value.strip()
+    return contents
+
+class TokenBucket:
+    """Refilling budget of `per_minute` units, allowed to burst up to one minute's worth"""
+    
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.available = per_minute
+        self.updated = time.monotonic()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (requests larger than capacity wait for a full bucket)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+    
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.available -= amount
+
+class RateLimitScheduler:
+    """Central gate for upstream LLM calls.
+    
+    Enforces requests/min and tokens/min budgets by queueing callers in FIFO
+    order, pauses everyone after a 429 for the advertised Retry-After, and retries
+    transient failures with jittered exponential backoff. A Retry-After longer
+    than `retry_after_max` fails the call rather than retrying before it is over.
+    """
+    
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_retries: int,
+                 backoff_base: float, backoff_max: float, retry_after_max: float):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self._queue = asyncio.Lock()  # Lock waiters are served in FIFO order
+        self._paused_until = 0.0
+        # Metrics
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+    
+    async def acquire(self, estimated_tokens: int) -> None:
+        """Wait until the request and token budgets allow one more call"""
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        start = time.monotonic()
+        try:
+            async with self._queue:
+                while True:
+                    delay = self._paused_until - time.monotonic()
+                    if self.requests:
+                        delay = max(delay, self.requests.wait_time(1))
+                    if self.tokens:
+                        delay = max(delay, self.tokens.wait_time(estimated_tokens))
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                if self.requests:
+                    self.requests.consume(1)
+                if self.tokens:
+                    self.tokens.consume(estimated_tokens)
+        finally:
+            self.queue_depth -= 1
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+    
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token budget once the real usage is known"""
+        if self.tokens and actual_tokens is not None:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+    
+    def retry_delay(self, attempt: int, error: OpenRouterError) -> Optional[float]:
+        """Delay before retry number `attempt` (0-based), or None to give up; a 429 also pauses all callers"""
+        if error.retry_after is not None:
+            if error.retry_after > self.retry_after_max:
+                return None
+            delay = error.retry_after
+        else:
+            # Full jitter keeps concurrent retries from synchronising
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if error.status_code == 429:
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self.retries += 1
+        return delay
+    
+    async def run(self, estimated_tokens: int, call: Callable[[], Awaitable[tuple]]) -> str:
+        """Run `call` (returning (text, total_tokens)) under the budgets, retrying transient errors"""
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(estimated_tokens)
+            try:
+                text, actual_tokens = await call()
+                self.record_usage(estimated_tokens, actual_tokens)
+                return text
+            except OpenRouterError as e:
+                delay = self.retry_delay(attempt, e) if e.retryable and attempt < self.max_retries else None
+                if delay is None:
+                    self.failures += 1
+                    raise
+                await asyncio.sleep(delay)
+    
+    def stats(self) -> dict:
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'admitted': self.admitted,
+            'avg_wait_seconds': round(self.total_wait / self.admitted, 4) if self.admitted else 0.0,
+            'max_wait_seconds': round(self.max_wait, 4),
+            'retries': self.retries,
+            'throttled': self.throttled,
+            'failures': self.failures,
+            'paused_for_seconds': round(max(0.0, self._paused_until - time.monotonic()), 3)
+        }
 
 class AIClient:
     def __init__(self):
         self.api_key = OPENROUTER_API_KEY
-        self.base_url = "https://openrouter.ai/api/v1/chat/completions"
+        self.base_url = OPENROUTER_BASE_URL
         # Using non-free version for better speed
         self.model = "meta-llama/llama-3.3-70b-instruct"
-    
-    async def _make_request(self, messages: list) -> str:
-        """Make a request to OpenRouter API"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "http://localhost:5173",
-            "X-Title": "DocForge AI"
+        # Read timeout per operation; connect/pool timeouts are shared
+        self.timeouts = {
+            'text': OPENROUTER_TEXT_TIMEOUT,
+            'outline': OPENROUTER_OUTLINE_TIMEOUT,
+            'section': OPENROUTER_SECTION_TIMEOUT,
+            'refine': OPENROUTER_REFINE_TIMEOUT,
+            'document': OPENROUTER_DOCUMENT_TIMEOUT,
+            'batch': OPENROUTER_DOCUMENT_TIMEOUT,
+            'title': OPENROUTER_OUTLINE_TIMEOUT,
+        }
+        self._http: Optional[httpx.AsyncClient] = None
+        self.cache = LLMCache()
+        # Identical requests already in flight share one upstream call
+        self.inflight = SingleFlight()
+        self.scheduler = RateLimitScheduler(
+            LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_RETRIES,
+            LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_RETRY_AFTER_MAX
+        )
+        # Expected completion size per operation, used to budget tokens/min up front
+        self.output_token_estimates = {
+            'text': 500,
+            'outline': 400,
+            'section': 500,
+            'refine': 500,
+            'document': 3000,
+            'batch': 2500,
+            'title': 30,
         }
+    
+    def _create_http_client(self) -> httpx.AsyncClient:
+        """Build the pooled, keep-alive HTTP client used for every OpenRouter call"""
+        limits = httpx.Limits(
+            max_connections=OPENROUTER_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENROUTER_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENROUTER_KEEPALIVE_EXPIRY
+        )
+        return httpx.AsyncClient(
+            http2=OPENROUTER_HTTP2 and HTTP2_AVAILABLE,
+            limits=limits,
+            timeout=httpx.Timeout(OPENROUTER_DOCUMENT_TIMEOUT, connect=OPENROUTER_CONNECT_TIMEOUT),
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": "http://localhost:5173",
+                "X-Title": "DocForge AI"
+            }
+        )
+    
+    async def startup(self) -> None:
+        """Open the shared HTTP client (called from the app lifespan)"""
+        if self._http is None or self._http.is_closed:
+            self._http = self._create_http_client()
+    
+    async def shutdown(self) -> None:
+        """Close the shared HTTP client and its pooled connections"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+    
+    @property
+    def http(self) -> httpx.AsyncClient:
+        # Created lazily so scripts that never run the app lifespan still work
+        if self._http is None or self._http.is_closed:
+            self._http = self._create_http_client()
+        return self._http
+    
+    def _timeout(self, operation: str) -> httpx.Timeout:
+        return httpx.Timeout(self.timeouts.get(operation, OPENROUTER_DOCUMENT_TIMEOUT),
+                             connect=OPENROUTER_CONNECT_TIMEOUT)
+    
+    async def _make_request(self, messages: list, operation: str = 'text',
+                            cacheable: bool = False, bypass_cache: bool = False) -> str:
+        """Make a request to OpenRouter API, serving cacheable requests from the LLM cache"""
+        fingerprint = request_fingerprint(self.model, messages)
+        if cacheable and not bypass_cache:
+            cached = await self.cache.get(fingerprint)
+            if cached is not None:
+                return cached
         
+        text = await self.inflight.do(fingerprint, lambda: self._fetch_completion(messages, operation))
+        
+        if cacheable:
+            await self.cache.set(fingerprint, text)
+        return text
+    
+    def _estimate_tokens(self, messages: list, operation: str) -> int:
+        # Roughly four characters per token for English prompts
+        prompt_tokens = sum(len(m.get('content', '')) for m in messages) // 4
+        return prompt_tokens + self.output_token_estimates.get(operation, 500)
+    
+    async def _fetch_completion(self, messages: list, operation: str) -> str:
+        """Send one chat completion upstream through the rate-limit scheduler"""
+        estimated_tokens = self._estimate_tokens(messages, operation)
+        try:
+            return await self.scheduler.run(
+                estimated_tokens,
+                lambda: self._post_completion(messages, operation)
+            )
+        except Exception as e:
+            raise Exception(f"Request failed: {str(e)}")
+    
+    async def _post_completion(self, messages: list, operation: str) -> tuple:
+        """Single upstream attempt; returns (text, total_tokens or None)"""
         payload = {
             "model": self.model,
             "messages": messages
         }
         
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(self.base_url, json=payload, headers=headers)
-                response.raise_for_status()
-                data = response.json()
-                return data['choices'][0]['message']['content']
-        except httpx.HTTPStatusError as e:
-            error_detail = e.response.text if hasattr(e.response, 'text') else str(e)
-            raise Exception(f"OpenRouter API error: {e.response.status_code} - {error_detail}")
+            response = await self.http.post(self.base_url, json=payload, timeout=self._timeout(operation))
+        except httpx.TransportError as e:
+            raise OpenRouterError(f"{type(e).__name__}: {str(e)}", retryable=True)
+        
+        if response.status_code >= 400:
+            raise status_error(response.status_code, response.text, response.headers)
+        
+        data = response.json()
+        usage = data.get('usage') or {}
+        return data['choices'][0]['message']['content'], usage.get('total_tokens')
+    
+    async def _stream_request(self, messages: list, operation: str = 'text') -> AsyncIterator[str]:
+        """Make a streaming request to OpenRouter API, yielding content deltas.
+        
+        Transient failures are retried only before the first token is forwarded.
+        """
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True
+        }
+        estimated_tokens = self._estimate_tokens(messages, operation)
+        
+        try:
+            for attempt in range(self.scheduler.max_retries + 1):
+                await self.scheduler.acquire(estimated_tokens)
+                started = False
+                try:
+                    async with self.http.stream('POST', self.base_url, json=payload,
+                                                timeout=self._timeout(operation)) as response:
+                        if response.status_code >= 400:
+                            error_detail = (await response.aread()).decode(errors='replace')
+                            raise status_error(response.status_code, error_detail, response.headers)
+                        
+                        async for line in response.aiter_lines():
+                            # Server-sent events; lines starting with ':' are keep-alive comments
+                            if not line.startswith('data:'):
+                                continue
+                            data = line[5:].strip()
+                            if data == '[DONE]':
+                                break
+                            chunk = json.loads(data)
+                            if 'error' in chunk:
+                                raise OpenRouterError(
+                                    f"OpenRouter API error: {chunk['error'].get('message', chunk['error'])}")
+                            if chunk.get('usage'):
+                                self.scheduler.record_usage(estimated_tokens, chunk['usage'].get('total_tokens'))
+                            choices = chunk.get('choices') or [{}]
+                            token = choices[0].get('delta', {}).get('content')
+                            if token:
+                                started = True
+                                yield token
+                    return
+                except httpx.TransportError as e:
+                    error = OpenRouterError(f"{type(e).__name__}: {str(e)}", retryable=True)
+                except OpenRouterError as e:
+                    error = e
+                delay = None
+                if not started and error.retryable and attempt < self.scheduler.max_retries:
+                    # None when Retry-After exceeds LLM_RETRY_AFTER_MAX: fail now rather than retry early
+                    delay = self.scheduler.retry_delay(attempt, error)
+                if delay is None:
+                    self.scheduler.failures += 1
+                    raise error
+                await asyncio.sleep(delay)
         except Exception as e:
             raise Exception(f"Request failed: {str(e)}")
     
@@ -49,7 +412,7 @@ class AIClient:
                 "content": prompt
             })
             
-            text = await self._make_request(messages)
+            text = await self._make_request(messages, 'text')
             
             return {
                 'text': text,
@@ -58,7 +421,7 @@ class AIClient:
         except Exception as e:
             raise Exception(f"AI generation error: {str(e)}")
     
-    async def generate_outline(self, description: str, doc_type: str) -> str:
+    async def generate_outline(self, description: str, doc_type: str, bypass_cache: bool = False) -> str:
         """Generate document outline or slide structure"""
         if doc_type == 'docx':
             prompt = f"""Create a detailed document outline for the following topic:
@@ -89,10 +452,25 @@ Keep it concise and presentation-ready."""
         
         try:
             messages = [{"role": "user", "content": prompt}]
-            return await self._make_request(messages)
+            return await self._make_request(messages, 'outline', cacheable=True, bypass_cache=bypass_cache)
         except Exception as e:
             raise Exception(f"Outline generation error: {str(e)}")
     
+    async def generate_document_title(self, description: str, doc_type: str) -> str:
+        """Generate a short, descriptive title for a document or presentation"""
+        prompt = f"""Write a clear, descriptive title for a {'document' if doc_type == 'docx' else 'presentation'} about:
+
+{description}
+
+Respond with the title only, on a single line, without quotes or markdown."""
+        
+        try:
+            messages = [{"role": "user", "content": prompt}]
+            title = await self._make_request(messages, 'title', cacheable=True)
+            return title.strip().splitlines()[0].strip('#*" ') if title.strip() else description[:100]
+        except Exception as e:
+            raise Exception(f"Title generation error: {str(e)}")
+    
     async def generate_embeddings(self, text: str) -> list:
         """Generate embeddings - Not supported with OpenRouter, returning empty"""
         # OpenRouter doesn't support embeddings directly
@@ -174,7 +552,7 @@ Example:
 • Key trends and opportunities"""
             
             messages = [{"role": "user", "content": content_prompt}]
-            content = await self._make_request(messages)
+            content = await self._make_request(messages, 'document')
             
             return {
                 'content': content,
@@ -184,11 +562,10 @@ Example:
         except Exception as e:
             raise Exception(f"Full document generation error: {str(e)}")
     
-    async def generate_section_content(self, section_title: str, doc_type: str, context: str = "") -> str:
-        """Generate content for a single section/slide"""
-        try:
-            if doc_type == 'docx':
-                prompt = f"""Generate detailed, professional content for the following document section:
+    def _section_messages(self, section_title: str, doc_type: str, context: str = "") -> list:
+        """Build the chat messages for generating a single section/slide"""
+        if doc_type == 'docx':
+            prompt = f"""Generate detailed, professional content for the following document section:
 
 Section Title: {section_title}
 
@@ -203,8 +580,8 @@ Requirements:
 - Do NOT include the section heading (it will be added separately)
 
 Generate the content now:"""
-            else:  # pptx
-                prompt = f"""Generate concise, impactful content for the following presentation slide:
+        else:  # pptx
+            prompt = f"""Generate concise, impactful content for the following presentation slide:
 
 Slide Title: {section_title}
 
@@ -219,16 +596,12 @@ Requirements:
 - Format as bullet points starting with •
 
 Generate the content now:"""
-            
-            messages = [{"role": "user", "content": prompt}]
-            return await self._make_request(messages)
-        except Exception as e:
-            raise Exception(f"Section generation error: {str(e)}")
+        
+        return [{"role": "user", "content": prompt}]
     
-    async def refine_section_content(self, current_content: str, refinement_prompt: str, doc_type: str) -> str:
-        """Refine existing section content based on user feedback"""
-        try:
-            prompt = f"""You are refining content for a {'document section' if doc_type == 'docx' else 'presentation slide'}.
+    def _refine_messages(self, current_content: str, refinement_prompt: str, doc_type: str) -> list:
+        """Build the chat messages for refining existing section content"""
+        prompt = f"""You are refining content for a {'document section' if doc_type == 'docx' else 'presentation slide'}.
 
 Current content:
 {current_content}
@@ -244,9 +617,90 @@ Requirements:
 - Do NOT add section/slide titles (they are separate)
 
 Generate the refined content now:"""
-            
-            messages = [{"role": "user", "content": prompt}]
-            return await self._make_request(messages)
+        
+        return [{"role": "user", "content": prompt}]
+    
+    def _batch_section_messages(self, section_titles: list, doc_type: str, context: str = "") -> list:
+        """Build the chat messages for generating several sections/slides in one call"""
+        numbered = "\n".join(f"{i}. {title}" for i, title in enumerate(section_titles, 1))
+        if doc_type == 'docx':
+            prompt = f"""Generate detailed, professional content for each of the following document sections:
+
+{numbered}
+
+{f"Context: {context}" if context else ""}
+
+Requirements:
+- Write comprehensive, well-structured content for every section
+- Use professional language
+- Include relevant examples or details
+- Format with proper paragraphs
+- Aim for 150-300 words per section depending on the topic
+- Do NOT include the section headings (they will be added separately)"""
+        else:  # pptx
+            prompt = f"""Generate concise, impactful content for each of the following presentation slides:
+
+{numbered}
+
+{f"Context: {context}" if context else ""}
+
+Requirements:
+- Provide 3-5 clear, concise bullet points per slide
+- Each bullet should be impactful and informative
+- Use presentation-appropriate language
+- Focus on key takeaways
+- Do NOT include the slide titles (they will be added separately)
+- Format as bullet points starting with •"""
+        
+        prompt += """
+
+Respond with ONLY a JSON object that maps each number above (as a string) to its content, for example:
+{"1": "Content for the first item...", "2": "Content for the second item..."}"""
+        
+        return [{"role": "user", "content": prompt}]
+    
+    async def generate_sections_batch(self, section_titles: list, doc_type: str, context: str = "",
+                                      bypass_cache: bool = False) -> dict:
+        """Generate several sections/slides in one call; returns {index: content} for parsed entries"""
+        try:
+            messages = self._batch_section_messages(section_titles, doc_type, context)
+            text = await self._make_request(messages, 'batch', cacheable=True, bypass_cache=bypass_cache)
+            return parse_batch_response(text, len(section_titles))
+        except Exception as e:
+            raise Exception(f"Batch section generation error: {str(e)}")
+    
+    async def generate_section_content(self, section_title: str, doc_type: str, context: str = "",
+                                       bypass_cache: bool = False) -> str:
+        """Generate content for a single section/slide"""
+        try:
+            messages = self._section_messages(section_title, doc_type, context)
+            return await self._make_request(messages, 'section', cacheable=True, bypass_cache=bypass_cache)
+        except Exception as e:
+            raise Exception(f"Section generation error: {str(e)}")
+    
+    async def refine_section_content(self, current_content: str, refinement_prompt: str, doc_type: str) -> str:
+        """Refine existing section content based on user feedback"""
+        try:
+            messages = self._refine_messages(current_content, refinement_prompt, doc_type)
+            return await self._make_request(messages, 'refine')
+        except Exception as e:
+            raise Exception(f"Refinement error: {str(e)}")
+    
+    async def stream_section_content(self, section_title: str, doc_type: str, context: str = "") -> AsyncIterator[str]:
+        """Stream content tokens for a single section/slide as they are generated"""
+        try:
+            messages = self._section_messages(section_title, doc_type, context)
+            async for token in self._stream_request(messages, 'section'):
+                yield token
+        except Exception as e:
+            raise Exception(f"Section generation error: {str(e)}")
+    
+    async def stream_refine_section_content(self, current_content: str, refinement_prompt: str, doc_type: str) -> AsyncIterator[str]:
+        """Stream refined section content tokens as they are generated"""
+        try:
+            messages = self._refine_messages(current_content, refinement_prompt, doc_type)
+            async for token in self._stream_request(messages, 'refine'):
+                yield token
         except Exception as e:
             raise Exception(f"Refinement error: {str(e)}")
 
@@ -0,0 +1,62 @@
+import asyncio
+import hashlib
+import time
+from firebase_admin import auth
+from cache import TTLCache
+from firebase_app import get_firebase_app
+from config import AUTH_TOKEN_CACHE_ENABLED, AUTH_TOKEN_CACHE_MAX_ENTRIES, AUTH_TOKEN_CACHE_MAX_TTL
+
+class TokenVerifier:
+    """Verifies Firebase ID tokens, caching decoded claims until the token expires"""
+
+    def __init__(self):
+        # Decoded claims keyed by token digest, so raw tokens are never held in memory
+        self.token_cache = TTLCache(max_entries=AUTH_TOKEN_CACHE_MAX_ENTRIES)
+        self.verifications = 0
+        self.verify_cpu_seconds = 0.0
+        self.verify_wall_seconds = 0.0
+
+    async def verify_token(self, token: str, check_revoked: bool = False) -> dict:
+        """Verify Firebase ID token.
+
+        Decoded claims are cached until the token's `exp`. check_revoked=True
+        skips the cache and asks Firebase whether the token was revoked.
+        """
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        if AUTH_TOKEN_CACHE_ENABLED and not check_revoked:
+            decoded_token = self.token_cache.get(key)
+            if decoded_token is not None:
+                return decoded_token
+
+        def verify() -> dict:
+            started = time.thread_time()
+            try:
+                return auth.verify_id_token(token, app=get_firebase_app(), check_revoked=check_revoked)
+            finally:
+                self.verify_cpu_seconds += time.thread_time() - started
+
+        started = time.perf_counter()
+        try:
+            # Signature check is CPU-bound and may fetch certs; keep it off the event loop
+            decoded_token = await asyncio.to_thread(verify)
+        except Exception as e:
+            raise Exception(f"Token verification failed: {str(e)}")
+        finally:
+            self.verifications += 1
+            self.verify_wall_seconds += time.perf_counter() - started
+
+        ttl = min(decoded_token.get('exp', 0) - time.time(), AUTH_TOKEN_CACHE_MAX_TTL)
+        if AUTH_TOKEN_CACHE_ENABLED and ttl > 0:
+            self.token_cache.set(key, decoded_token, ttl=ttl)
+        return decoded_token
+
+    def stats(self) -> dict:
+        verifications = self.verifications
+        return {
+            'cache': self.token_cache.stats(),
+            'verifications': verifications,
+            'avg_verify_cpu_ms': round(self.verify_cpu_seconds * 1000 / verifications, 3) if verifications else 0.0,
+            'avg_verify_wall_ms': round(self.verify_wall_seconds * 1000 / verifications, 3) if verifications else 0.0
+        }
+
+token_verifier = TokenVerifier()
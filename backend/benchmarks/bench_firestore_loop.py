@@ -0,0 +1,109 @@
+"""Benchmark: request latency under mixed load with blocking vs async Firestore access.
+
+Runs a stream of lightweight GET / requests against the FastAPI app (in-process,
+over ASGI) while background readers fetch a project document in a tight loop:
+first with the synchronous Firestore client called from async code (the old
+FirestoreDB behaviour), then through the async FirestoreDB. With the blocking
+client every Firestore round trip stalls the event loop, so GET / latency tracks
+Firestore latency; with the async client it should stay flat.
+
+Needs a Firestore to talk to. Point it at the emulator to avoid touching real
+data, e.g.:
+    gcloud emulators firestore start --host-port=localhost:8080
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python benchmarks/bench_firestore_loop.py
+
+Usage (from backend/):
+    python benchmarks/bench_firestore_loop.py --readers 20 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from firebase_admin import firestore  # noqa: E402
+from firebase_app import get_firebase_app  # noqa: E402
+from firestore_client import FirestoreDB  # noqa: E402
+from main import app  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def measure(read_project, readers: int, seconds: float) -> dict:
+    stop = time.monotonic() + seconds
+    reads = 0
+
+    async def reader():
+        nonlocal reads
+        while time.monotonic() < stop:
+            await read_project()
+            reads += 1
+            await asyncio.sleep(0)
+
+    async def prober(client: httpx.AsyncClient, latencies: list):
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            await client.get('/')
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.01)
+
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        await asyncio.gather(prober(client, latencies), *(reader() for _ in range(readers)))
+
+    return {
+        'reads_per_second': reads / seconds,
+        'requests': len(latencies),
+        'p50': statistics.median(latencies),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'max': max(latencies),
+    }
+
+
+def report(label: str, result: dict):
+    print(f"  {label:<16} {result['reads_per_second']:8.1f} reads/s | GET / over {result['requests']} requests: "
+          f"p50 {result['p50']:7.1f} ms  p95 {result['p95']:7.1f} ms  "
+          f"p99 {result['p99']:7.1f} ms  max {result['max']:7.1f} ms")
+
+
+async def run(readers: int, seconds: float):
+    if not os.getenv('FIRESTORE_EMULATOR_HOST'):
+        print("WARNING: FIRESTORE_EMULATOR_HOST is not set; this will read and write the real project")
+
+    firestore_db = FirestoreDB()
+    project_id = await firestore_db.create_project('bench-user', {
+        'title': 'Benchmark project',
+        'description': 'Firestore event loop benchmark',
+        'type': 'docx'
+    })
+    sync_db = firestore.client(get_firebase_app())
+
+    async def blocking_read():
+        # What every FirestoreDB method did before: a sync call inside async def
+        sync_db.collection('projects').document(project_id).get()
+
+    async def async_read():
+        await firestore_db.get_project(project_id)
+
+    print(f"{readers} concurrent readers for {seconds:.0f}s each")
+    report('blocking client', await measure(blocking_read, readers, seconds))
+    report('async client', await measure(async_read, readers, seconds))
+
+    await firestore_db.db.collection('projects').document(project_id).delete()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.readers, args.seconds))
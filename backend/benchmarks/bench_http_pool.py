@@ -0,0 +1,147 @@
+"""Benchmark: fresh httpx.AsyncClient per call vs the shared pooled AIClient client.
+
+Runs a local TLS server that mimics the OpenRouter chat completions endpoint and
+counts how many connections each strategy opens. A configurable delay is added to
+the first request of every connection to stand in for the extra TCP+TLS round
+trips to a remote host.
+
+Usage (from backend/):
+    python benchmarks/bench_http_pool.py --calls 20 --connect-latency-ms 80
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import ssl
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# config.py insists on Firebase credentials; they are never used here
+os.environ.setdefault('FIREBASE_SERVICE_ACCOUNT_JSON', '{}')
+
+import httpx  # noqa: E402
+from cryptography import x509  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+
+RESPONSE_BODY = json.dumps({
+    'choices': [{'message': {'role': 'assistant', 'content': 'Benchmark section content.'}}]
+}).encode()
+
+
+def write_self_signed_cert(directory: str):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'localhost')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName('localhost')]), critical=False)
+            .sign(key, hashes.SHA256()))
+    cert_path = os.path.join(directory, 'cert.pem')
+    key_path = os.path.join(directory, 'key.pem')
+    with open(cert_path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM,
+                                  serialization.PrivateFormat.TraditionalOpenSSL,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+class FakeOpenRouter:
+    """Minimal HTTP/1.1 keep-alive server returning a canned completion"""
+
+    def __init__(self, connect_latency: float):
+        self.connect_latency = connect_latency
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        first = True
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = 0
+                for line in head.decode().split('\r\n'):
+                    if line.lower().startswith('content-length:'):
+                        length = int(line.split(':', 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                if first:
+                    await asyncio.sleep(self.connect_latency)
+                    first = False
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             + f'Content-Length: {len(RESPONSE_BODY)}\r\n\r\n'.encode()
+                             + RESPONSE_BODY)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def per_call_client(url: str, messages: list) -> str:
+    """The pre-pooling behaviour: a new client (and connection) for every call"""
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        response = await client.post(url, json={'model': 'bench', 'messages': messages})
+        response.raise_for_status()
+        return response.json()['choices'][0]['message']['content']
+
+
+async def run(calls: int, connect_latency: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        cert_path, key_path = write_self_signed_cert(tmp)
+        os.environ['SSL_CERT_FILE'] = cert_path
+
+        server_ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_ctx.load_cert_chain(cert_path, key_path)
+        fake = FakeOpenRouter(connect_latency)
+        server = await asyncio.start_server(fake.handle, 'localhost', 0, ssl=server_ctx)
+        port = server.sockets[0].getsockname()[1]
+        url = f'https://localhost:{port}/api/v1/chat/completions'
+
+        from ai_client import AIClient
+        messages = [{'role': 'user', 'content': 'Write a section'}]
+
+        fake.connections = 0
+        start = time.perf_counter()
+        for _ in range(calls):
+            await per_call_client(url, messages)
+        fresh_time = time.perf_counter() - start
+        fresh_connections = fake.connections
+
+        client = AIClient()
+        client.base_url = url
+        await client.startup()
+        fake.connections = 0
+        start = time.perf_counter()
+        for _ in range(calls):
+            await client._make_request(messages, 'section')
+        pooled_time = time.perf_counter() - start
+        pooled_connections = fake.connections
+        await client.shutdown()
+
+        server.close()
+        await server.wait_closed()
+
+    print(f"{calls} sequential calls, simulated connect latency {connect_latency * 1000:.0f} ms")
+    print(f"  per-call client: {fresh_time * 1000:8.1f} ms total, "
+          f"{fresh_time / calls * 1000:6.1f} ms/call, {fresh_connections} connections")
+    print(f"  pooled client:   {pooled_time * 1000:8.1f} ms total, "
+          f"{pooled_time / calls * 1000:6.1f} ms/call, {pooled_connections} connections")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--connect-latency-ms', type=float, default=80.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls, args.connect_latency_ms / 1000))
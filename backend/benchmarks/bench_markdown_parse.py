@@ -0,0 +1,180 @@
+"""Benchmark: markdown parse cost of exports, per-renderer regex scanning vs the shared markdown_ast parser.
+
+Generates a large synthetic document (headings, bullets, numbered items and
+paragraphs with bold/italic/code markup) and times:
+
+  legacy  the pre-markdown_ast scanning, reproduced here without the
+          python-docx/python-pptx calls: the docx line classifier plus
+          apply_inline_formatting (whose combined pattern was rebuilt per
+          call), and the separate pptx line scanner with its re.sub passes.
+          Both ran on every export of a project.
+  shared  one markdown_ast.parse() whose block tree feeds both renderers.
+
+Optionally (--render) it also times full build_docx/build_pptx for reference,
+which includes the document library work that parsing does not.
+
+Usage (from backend/):
+    python benchmarks/bench_markdown_parse.py --sections 400 --repeat 5
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# config.py insists on Firebase credentials; they are never used here
+os.environ.setdefault('FIREBASE_SERVICE_ACCOUNT_JSON', '{}')
+
+import markdown_ast  # noqa: E402
+
+WORDS = ("the project roadmap quarterly revenue customer onboarding latency budget team "
+         "market analysis risk mitigation strategy delivery milestone feedback design").split()
+
+
+def sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(8, 20))
+    for _ in range(rng.randint(0, 3)):
+        idx = rng.randrange(len(words))
+        words[idx] = rng.choice(('**{}**', '*{}*', '`{}`', '_{}_')).format(words[idx])
+    return ' '.join(words).capitalize() + '.'
+
+
+def synthetic_document(sections: int, seed: int) -> str:
+    rng = random.Random(seed)
+    lines = ['# Synthetic Benchmark Document', '']
+    for idx in range(sections):
+        lines += [f'## Section {idx + 1}: {sentence(rng)[:40]}', '']
+        for _ in range(rng.randint(1, 3)):
+            lines += [' '.join(sentence(rng) for _ in range(rng.randint(2, 6))), '']
+        if rng.random() < 0.5:
+            lines += [f'### {sentence(rng)[:30]}', '']
+        lines += [f"{'  ' if rng.random() < 0.2 else ''}- {sentence(rng)}" for _ in range(rng.randint(2, 6))]
+        lines += [f"{n + 1}. {sentence(rng)}" for n in range(rng.randint(0, 4))]
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def legacy_inline(text: str) -> list:
+    bold_pattern = r'\*\*(.+?)\*\*'
+    italic_pattern = r'(?<!\*)\*(?!\*)(.+?)(?<!\*)\*(?!\*)|_(.+?)_'
+    code_pattern = r'`(.+?)`'
+    combined_pattern = f'({bold_pattern})|({italic_pattern})|({code_pattern})'
+    matches = list(re.finditer(combined_pattern, text))
+    if not matches:
+        return [text]
+    parts = []
+    current_pos = 0
+    for match in matches:
+        if match.start() > current_pos:
+            parts.append(text[current_pos:match.start()])
+        if match.group(1):
+            parts.append(('bold', match.group(2)))
+        elif match.group(3) or match.group(4):
+            parts.append(('italic', match.group(4) if match.group(4) else match.group(5)))
+        elif match.group(6):
+            parts.append(('code', match.group(7)))
+        current_pos = match.end()
+    if current_pos < len(text):
+        parts.append(text[current_pos:])
+    return parts
+
+
+def legacy_docx(content: str) -> list:
+    out = []
+    for line in content.split('\n'):
+        line = line.rstrip()
+        if not line.strip():
+            continue
+        if line.startswith('# '):
+            out.append(('h1', line[2:]))
+        elif line.startswith('## '):
+            out.append(('h2', line[3:]))
+        elif line.startswith('### '):
+            out.append(('h3', line[4:]))
+        elif line.strip().startswith('•') or line.strip().startswith('- '):
+            text = line.strip()[2:] if line.strip().startswith('- ') else line.strip()[1:]
+            out.append(('bullet', legacy_inline(text.strip())))
+        elif re.match(r'^\d+\.\s', line.strip()):
+            text = re.sub(r'^\d+\.\s', '', line.strip())
+            out.append(('number', legacy_inline(text)))
+        else:
+            out.append(('para', legacy_inline(line)))
+    return out
+
+
+def legacy_clean(text: str) -> str:
+    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
+    text = re.sub(r'\*(.+?)\*', r'\1', text)
+    return re.sub(r'`(.+?)`', r'\1', text)
+
+
+def legacy_pptx(content: str) -> list:
+    out = []
+    lines = content.split('\n')
+    for line in lines:
+        if line.startswith('# '):
+            out.append(('title', line[2:].strip()))
+            break
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('# ') or line.startswith('## ') or line.startswith('### '):
+            out.append(('heading', line.lstrip('#').strip()))
+        elif line.startswith('•') or line.startswith('- '):
+            text = line[2:] if line.startswith('- ') else line[1:]
+            out.append(('bullet', legacy_clean(text.strip())))
+        elif len(line) > 15 and not line.startswith('#'):
+            out.append(('para', legacy_clean(line)))
+    return out
+
+
+def legacy(content: str):
+    return legacy_docx(content), legacy_pptx(content)
+
+
+def shared(content: str):
+    blocks = markdown_ast.parse(content)
+    # The pptx renderer reads each block's plain text as well
+    return blocks, [block.text for block in blocks]
+
+
+def timed(fn, content: str, repeat: int) -> list:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(content)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main(sections: int, repeat: int, seed: int, render: bool):
+    content = synthetic_document(sections, seed)
+    lines = content.count('\n') + 1
+    print(f"{sections} sections, {lines} lines, {len(content) / 1024:.0f} KiB of markdown")
+    results = {}
+    for name, fn in (('legacy', legacy), ('shared', shared)):
+        fn(content)  # warm up (and let re's pattern cache fill, as it would in a long-lived worker)
+        times = timed(fn, content, repeat)
+        results[name] = statistics.median(times)
+        print(f"  {name:<8} median {results[name]:8.2f} ms  min {min(times):8.2f} ms")
+    print(f"  parse cost {results['legacy'] / results['shared']:.1f}x lower")
+
+    if render:
+        from exporter import exporter
+        for document_type, build in (('docx', exporter.build_docx), ('pptx', exporter.build_pptx)):
+            times = timed(lambda text: build('Benchmark', text), content, max(1, repeat // 2))
+            print(f"  build_{document_type} median {statistics.median(times):8.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sections', type=int, default=400)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--render', action='store_true', help='also time full docx/pptx builds')
+    args = parser.parse_args()
+    main(args.sections, args.repeat, args.seed, args.render)
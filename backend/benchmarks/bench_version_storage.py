@@ -0,0 +1,115 @@
+"""Benchmark: version storage size and read latency for full copies vs delta chains.
+
+Simulates a long editing history of a markdown document (a few lines changed,
+added or removed per save) and encodes it with version_codec at several keyframe
+intervals. Interval 1 stores every version as a compressed keyframe; 'raw' is the
+old behaviour of storing the full text in every version document. For each
+interval it reports total stored bytes, the largest stored version, and the time
+to reconstruct a version from its keyframe with a cold cache.
+
+Usage (from backend/):
+    python benchmarks/bench_version_storage.py --versions 300 --doc-kb 60
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# config.py insists on Firebase credentials; they are never used here
+os.environ.setdefault('FIREBASE_SERVICE_ACCOUNT_JSON', '{}')
+
+from version_codec import encode_version, decode_chain, DELTA  # noqa: E402
+
+WORDS = ("the project roadmap quarterly revenue customer onboarding latency budget team "
+         "market analysis risk mitigation strategy delivery milestone feedback design").split()
+
+
+def random_line(rng: random.Random) -> str:
+    if rng.random() < 0.1:
+        return f"## {' '.join(rng.choices(WORDS, k=4)).title()}\n"
+    return ' '.join(rng.choices(WORDS, k=rng.randint(8, 24))) + ".\n"
+
+
+def edit_history(versions: int, doc_kb: int, seed: int) -> list:
+    rng = random.Random(seed)
+    lines = []
+    while sum(len(line) for line in lines) < doc_kb * 1024:
+        lines.append(random_line(rng))
+    history = []
+    for _ in range(versions):
+        for _ in range(rng.randint(1, 5)):
+            action = rng.random()
+            idx = rng.randrange(len(lines))
+            if action < 0.6:
+                lines[idx] = random_line(rng)
+            elif action < 0.85:
+                lines.insert(idx, random_line(rng))
+            elif len(lines) > 1:
+                del lines[idx]
+        history.append(''.join(lines))
+    return history
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(history: list, interval: int) -> dict:
+    stored = []
+    encode_times = []
+    previous = None
+    for idx, content in enumerate(history):
+        start = time.perf_counter()
+        version = encode_version(content, previous['content'] if previous else None,
+                                 str(idx - 1) if previous else None,
+                                 previous['chain_length'] if previous else 0, interval)
+        encode_times.append((time.perf_counter() - start) * 1000)
+        stored.append(version)
+        previous = {'content': content, 'chain_length': version['chain_length']}
+
+    read_times = []
+    for idx, content in enumerate(history):
+        start = time.perf_counter()
+        chain = [stored[idx]]
+        while chain[-1]['encoding'] == DELTA:
+            chain.append(stored[int(chain[-1]['base_version_id'])])
+        chain.reverse()
+        assert decode_chain(chain) == content
+        read_times.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'total': sum(version['stored_size'] for version in stored),
+        'largest': max(version['stored_size'] for version in stored),
+        'encode_ms': statistics.mean(encode_times),
+        'read_p50': statistics.median(read_times),
+        'read_p95': percentile(read_times, 95),
+        'read_max': max(read_times),
+    }
+
+
+def main(versions: int, doc_kb: int, intervals: list, seed: int):
+    history = edit_history(versions, doc_kb, seed)
+    raw_total = sum(len(content.encode('utf-8')) for content in history)
+    raw_largest = max(len(content.encode('utf-8')) for content in history)
+    print(f"{versions} versions of a ~{doc_kb} KiB document")
+    print(f"  {'raw':<12} stored {raw_total / 1024:10.1f} KiB | largest doc {raw_largest / 1024:7.1f} KiB")
+    for interval in intervals:
+        result = run(history, interval)
+        print(f"  {'interval ' + str(interval):<12} stored {result['total'] / 1024:10.1f} KiB "
+              f"({raw_total / result['total']:5.1f}x smaller) | largest doc {result['largest'] / 1024:7.1f} KiB | "
+              f"encode {result['encode_ms']:6.2f} ms | read p50 {result['read_p50']:6.2f} ms  "
+              f"p95 {result['read_p95']:6.2f} ms  max {result['read_max']:6.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--versions', type=int, default=300)
+    parser.add_argument('--doc-kb', type=int, default=60)
+    parser.add_argument('--intervals', type=int, nargs='+', default=[1, 10, 20, 50])
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    main(args.versions, args.doc_kb, args.intervals, args.seed)
@@ -4,6 +4,10 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Where projects live: 'firestore', or 'sqlite' for local load tests and single-node deployments
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'firestore').lower()
+SQLITE_DB_PATH = os.getenv('SQLITE_DB_PATH', './data/docforge.sqlite3')
+
 # Parse Firebase credentials - handle both file path (local) and JSON string (Render)
 firebase_creds_env = os.getenv('FIREBASE_SERVICE_ACCOUNT_JSON')
 if firebase_creds_env and firebase_creds_env.strip().startswith('{'):
@@ -13,9 +17,110 @@ elif firebase_creds_env and os.path.isfile(firebase_creds_env):
     # It's a file path (local development)
     with open(firebase_creds_env, 'r') as f:
         FIREBASE_SERVICE_ACCOUNT = json.load(f)
-else:
+elif STORAGE_BACKEND == 'firestore':
     raise ValueError("FIREBASE_SERVICE_ACCOUNT_JSON must be either a valid file path or a JSON string")
+else:
+    # SQLite storage: Firebase is only used to verify ID tokens, which needs FIRESTORE_PROJECT_ID
+    FIREBASE_SERVICE_ACCOUNT = None
 
 FIRESTORE_PROJECT_ID = os.getenv('FIRESTORE_PROJECT_ID')
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
+
+# OpenRouter HTTP client: one pooled client is shared for the app's lifetime
+OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1/chat/completions')
+OPENROUTER_HTTP2 = os.getenv('OPENROUTER_HTTP2', 'true').lower() == 'true'
+OPENROUTER_MAX_CONNECTIONS = int(os.getenv('OPENROUTER_MAX_CONNECTIONS', '50'))
+OPENROUTER_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('OPENROUTER_MAX_KEEPALIVE_CONNECTIONS', '20'))
+OPENROUTER_KEEPALIVE_EXPIRY = float(os.getenv('OPENROUTER_KEEPALIVE_EXPIRY', '90'))
+OPENROUTER_CONNECT_TIMEOUT = float(os.getenv('OPENROUTER_CONNECT_TIMEOUT', '10'))
+
+# Per-operation read timeouts (seconds)
+OPENROUTER_TEXT_TIMEOUT = float(os.getenv('OPENROUTER_TEXT_TIMEOUT', '60'))
+OPENROUTER_OUTLINE_TIMEOUT = float(os.getenv('OPENROUTER_OUTLINE_TIMEOUT', '60'))
+OPENROUTER_SECTION_TIMEOUT = float(os.getenv('OPENROUTER_SECTION_TIMEOUT', '90'))
+OPENROUTER_REFINE_TIMEOUT = float(os.getenv('OPENROUTER_REFINE_TIMEOUT', '90'))
+OPENROUTER_DOCUMENT_TIMEOUT = float(os.getenv('OPENROUTER_DOCUMENT_TIMEOUT', '240'))
+
+# Structured generation fan-out
+SECTION_GENERATION_CONCURRENCY = int(os.getenv('SECTION_GENERATION_CONCURRENCY', '5'))
+GENERATION_MAX_CONCURRENCY = int(os.getenv('GENERATION_MAX_CONCURRENCY', '20'))
+# Sections per LLM call; 1 generates every section with its own call
+SECTION_BATCH_SIZE = int(os.getenv('SECTION_BATCH_SIZE', '1'))
+SECTION_BATCH_MAX_SIZE = int(os.getenv('SECTION_BATCH_MAX_SIZE', '10'))
+# Generated sections are persisted in batches of this size, or after this many seconds
+SECTION_WRITE_BATCH_SIZE = int(os.getenv('SECTION_WRITE_BATCH_SIZE', '10'))
+SECTION_WRITE_MAX_DELAY = float(os.getenv('SECTION_WRITE_MAX_DELAY', '2.0'))
+# /generate-document: one concurrent call per outline section instead of one huge completion
+PIPELINED_DOCUMENT_GENERATION = os.getenv('PIPELINED_DOCUMENT_GENERATION', 'true').lower() == 'true'
+
+# GET /projects page size (default and upper bound)
+PROJECTS_PAGE_SIZE = int(os.getenv('PROJECTS_PAGE_SIZE', '50'))
+PROJECTS_PAGE_MAX_SIZE = int(os.getenv('PROJECTS_PAGE_MAX_SIZE', '200'))
+
+# GET /projects/{id}/versions page size (default and upper bound)
+VERSIONS_PAGE_SIZE = int(os.getenv('VERSIONS_PAGE_SIZE', '20'))
+VERSIONS_PAGE_MAX_SIZE = int(os.getenv('VERSIONS_PAGE_MAX_SIZE', '100'))
+
+# Versions are stored as compressed deltas with a full keyframe at least every N versions
+VERSION_KEYFRAME_INTERVAL = int(os.getenv('VERSION_KEYFRAME_INTERVAL', '20'))
+VERSION_CONTENT_CACHE_MAX_BYTES = int(os.getenv('VERSION_CONTENT_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# Verified Firebase ID tokens are cached until they expire (capped at AUTH_TOKEN_CACHE_MAX_TTL)
+AUTH_TOKEN_CACHE_ENABLED = os.getenv('AUTH_TOKEN_CACHE_ENABLED', 'true').lower() == 'true'
+AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('AUTH_TOKEN_CACHE_MAX_ENTRIES', '10000'))
+AUTH_TOKEN_CACHE_MAX_TTL = float(os.getenv('AUTH_TOKEN_CACHE_MAX_TTL', '3600'))
+
+# Project metadata (owner, type, title) cached for ownership checks
+PROJECT_META_CACHE_TTL = float(os.getenv('PROJECT_META_CACHE_TTL', '60'))
+PROJECT_META_CACHE_MAX_ENTRIES = int(os.getenv('PROJECT_META_CACHE_MAX_ENTRIES', '5000'))
+
+# LLM response cache (memory LRU, plus an optional SQLite tier when LLM_CACHE_PATH is set)
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', '86400'))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '2000'))
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', '')
+LLM_CACHE_DISK_MAX_BYTES = int(os.getenv('LLM_CACHE_DISK_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# Upstream LLM rate limits; 0 disables a budget
+LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '200'))
+LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', '0'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '4'))
+LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', '1.0'))
+LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', '30'))
+# Longest Retry-After honoured; a longer one fails the call instead of retrying early
+LLM_RETRY_AFTER_MAX = float(os.getenv('LLM_RETRY_AFTER_MAX', '300'))
+
+# Background generation jobs
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_QUEUE_LIMIT = int(os.getenv('JOB_QUEUE_LIMIT', '100'))
+JOB_RETENTION_SECONDS = float(os.getenv('JOB_RETENTION_SECONDS', '3600'))
+
+# DOCX/PPTX rendering runs in a process pool; 0 workers renders in a thread instead
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', str(min(4, os.cpu_count() or 1))))
+EXPORT_QUEUE_LIMIT = int(os.getenv('EXPORT_QUEUE_LIMIT', '32'))
+# Rendered exports are cached by content hash (title, type, exporter version, content)
+EXPORT_CACHE_MAX_BYTES = int(os.getenv('EXPORT_CACHE_MAX_BYTES', str(128 * 1024 * 1024)))
+EXPORT_CACHE_TTL = float(os.getenv('EXPORT_CACHE_TTL', '3600'))
+# Exports render in memory; larger ones are spooled to temporary files under EXPORTS_DIR,
+# whose spooled files (only) are pruned by age and total size every EXPORT_CLEANUP_INTERVAL seconds
+EXPORTS_DIR = os.getenv('EXPORTS_DIR', './exports')
+EXPORT_SPOOL_THRESHOLD = int(os.getenv('EXPORT_SPOOL_THRESHOLD', str(8 * 1024 * 1024)))
+EXPORT_RETENTION_SECONDS = float(os.getenv('EXPORT_RETENTION_SECONDS', '900'))
+EXPORT_RETENTION_MAX_BYTES = int(os.getenv('EXPORT_RETENTION_MAX_BYTES', str(512 * 1024 * 1024)))
+EXPORT_CLEANUP_INTERVAL = float(os.getenv('EXPORT_CLEANUP_INTERVAL', '300'))
+# Optional corporate templates for exports, loaded once per export worker. The .pptx needs
+# title, title-and-content and title-only as its first, second and sixth layouts. The .docx
+# should define 'Title', 'Heading 1'-'Heading 6', 'List Bullet'/'List Bullet 2'/'List Bullet 3'
+# and 'List Number'/'List Number 2'/'List Number 3'; missing ones fall back to the nearest
+# defined heading, the base list style or 'List Paragraph', then to 'Normal'.
+DOCX_TEMPLATE_PATH = os.getenv('DOCX_TEMPLATE_PATH') or None
+PPTX_TEMPLATE_PATH = os.getenv('PPTX_TEMPLATE_PATH') or None
+for template_path in (DOCX_TEMPLATE_PATH, PPTX_TEMPLATE_PATH):
+    if template_path and not os.path.isfile(template_path):
+        raise ValueError(f"Export template not found: {template_path}")
+
+# Queue the missing sections of generations interrupted by a restart. Disable when
+# several instances share the database, and use /projects/{id}/resume-generation instead
+RESUME_GENERATION_ON_STARTUP = os.getenv('RESUME_GENERATION_ON_STARTUP', 'true').lower() == 'true'
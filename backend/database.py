@@ -0,0 +1,14 @@
+from config import STORAGE_BACKEND, SQLITE_DB_PATH
+from storage import StorageBackend
+
+def create_storage() -> StorageBackend:
+    """Instantiate the storage backend selected by STORAGE_BACKEND"""
+    if STORAGE_BACKEND == 'firestore':
+        from firestore_client import FirestoreDB
+        return FirestoreDB()
+    if STORAGE_BACKEND == 'sqlite':
+        from sqlite_client import SQLiteDB
+        return SQLiteDB(SQLITE_DB_PATH)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+
+db = create_storage()
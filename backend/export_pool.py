@@ -0,0 +1,208 @@
+import asyncio
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple, Union
+from cache import TTLCache
+from singleflight import SingleFlight
+from exporter import render_export, export_key, load_templates
+from config import (
+    EXPORT_WORKERS, EXPORT_QUEUE_LIMIT, EXPORT_CACHE_MAX_BYTES, EXPORT_CACHE_TTL,
+    EXPORTS_DIR, EXPORT_SPOOL_THRESHOLD, EXPORT_RETENTION_SECONDS, EXPORT_RETENTION_MAX_BYTES,
+    EXPORT_CLEANUP_INTERVAL
+)
+
+def touch(path: str) -> bool:
+    """Mark a spooled export as recently used; False if retention already removed it"""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+# Files the export pool writes to the spool directory: '<export_key>.<type>', and the
+# '.export-*' temporaries render_export renames into place; nothing else is ever pruned
+SPOOL_FILE_PATTERN = re.compile(r'(?:[0-9a-f]{64}\.(?:docx|pptx)|\.export-\w+)')
+
+def prune_exports(directory: str, max_age: float, max_bytes: int) -> int:
+    """Delete spooled exports older than `max_age` seconds, then the oldest until the rest fit in `max_bytes`.
+
+    Only files matching SPOOL_FILE_PATTERN are considered, so pointing EXPORTS_DIR
+    at a shared directory never deletes unrelated files. Returns the number deleted.
+    """
+    try:
+        entries = [entry for entry in os.scandir(directory)
+                   if SPOOL_FILE_PATTERN.fullmatch(entry.name) and entry.is_file()]
+    except FileNotFoundError:
+        return 0
+    files = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+
+    cutoff = time.time() - max_age
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for mtime, size, path in files:
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    return removed
+
+class ExportQueueFull(Exception):
+    """Raised when every export worker is busy and the wait queue is full"""
+
+class ExportPool:
+    """Renders DOCX/PPTX exports in worker processes so they never block the event loop.
+
+    At most `workers` exports render at once; up to `queue_limit` more wait for
+    a worker and anything beyond that is rejected with ExportQueueFull. With
+    workers=0 exports render in a thread instead (one process, no parallelism).
+    """
+
+    def __init__(self, workers: int = EXPORT_WORKERS, queue_limit: int = EXPORT_QUEUE_LIMIT,
+                 spool_dir: str = EXPORTS_DIR, spool_threshold: int = EXPORT_SPOOL_THRESHOLD):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.spool_dir = spool_dir
+        self.spool_threshold = spool_threshold
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cleanup: Optional[asyncio.Task] = None
+        self._pending = 0
+        # Rendered exports by export_key (bytes, or the path of a spooled file),
+        # so repeat downloads of unchanged documents skip rendering
+        self.cache = TTLCache(max_entries=1024, ttl=EXPORT_CACHE_TTL, max_bytes=EXPORT_CACHE_MAX_BYTES, sizeof=len)
+        self.inflight = SingleFlight()
+        self.rendered = 0
+        self.rejected = 0
+        self.failed = 0
+        self.spooled = 0
+        self.pruned = 0
+        self.restarts = 0
+
+    def start(self) -> None:
+        """Start the worker processes and the exports directory cleanup; call from within the event loop"""
+        if self.workers > 0 and self._executor is None:
+            self._executor = self._new_executor()
+        if self._cleanup is None:
+            self._cleanup = asyncio.create_task(self._cleanup_loop())
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the API process runs an event loop and gRPC threads
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=load_templates)
+
+    def _replace_broken(self, executor: ProcessPoolExecutor) -> None:
+        """Swap in a fresh pool after a worker died (OOM, segfault); other renders on it fail once"""
+        if self._executor is not executor:
+            return  # Already replaced by another failed render
+        print("WARNING: An export worker died; restarting the export pool")
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._new_executor()
+        self.restarts += 1
+
+    def stop(self) -> None:
+        if self._cleanup is not None:
+            self._cleanup.cancel()
+            self._cleanup = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _cleanup_loop(self) -> None:
+        """Apply the EXPORT_RETENTION_* policy to spooled files in the exports directory"""
+        while True:
+            try:
+                self.pruned += await asyncio.to_thread(
+                    prune_exports, self.spool_dir, EXPORT_RETENTION_SECONDS, EXPORT_RETENTION_MAX_BYTES)
+            except Exception as e:
+                print(f"WARNING: Pruning {self.spool_dir} failed: {e}")
+            await asyncio.sleep(EXPORT_CLEANUP_INTERVAL)
+
+    async def render(self, document_type: str, title: str, content: str, outline: Optional[str] = None,
+                     spool_path: Optional[str] = None) -> Union[bytes, str]:
+        """Render an export in memory.
+
+        Returns the file bytes, or `spool_path` when the export is above the spool
+        threshold and was written there instead.
+        """
+        if self._pending >= max(self.workers, 1) + self.queue_limit:
+            self.rejected += 1
+            raise ExportQueueFull("Too many exports are in progress, please retry shortly")
+        self._pending += 1
+        try:
+            args = (document_type, title, content, outline, spool_path, self.spool_threshold)
+            executor = self._executor
+            if executor is None:
+                result = await asyncio.to_thread(render_export, *args)
+            else:
+                loop = asyncio.get_running_loop()
+                try:
+                    result = await loop.run_in_executor(executor, render_export, *args)
+                except BrokenProcessPool:
+                    # Not retried: an export that killed its worker would most likely kill the next one too
+                    self._replace_broken(executor)
+                    raise RuntimeError("The export worker crashed while rendering this document")
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._pending -= 1
+        self.rendered += 1
+        if isinstance(result, str):
+            self.spooled += 1
+        return result
+
+    async def render_cached(self, document_type: str, title: str, content: str,
+                            outline: Optional[str] = None) -> Tuple[str, Union[bytes, str]]:
+        """Rendered export (bytes, or the path of a spooled file) and its content hash (usable as an ETag).
+
+        Identical concurrent requests share one render, and results are cached
+        by export_key until EXPORT_CACHE_TTL or the size budget evicts them.
+        Large exports are cached as their spooled file, which stays subject to
+        the EXPORT_RETENTION_* policy.
+        """
+        key = export_key(document_type, title, content, outline)
+        data = self.cache.get(key)
+        if isinstance(data, str) and not await asyncio.to_thread(touch, data):
+            self.cache.invalidate(key)
+            data = None
+        if data is None:
+            data = await self.inflight.do(key, lambda: self._render_cached(key, document_type, title, content, outline))
+        return key, data
+
+    async def _render_cached(self, key: str, document_type: str, title: str, content: str,
+                             outline: Optional[str]) -> Union[bytes, str]:
+        spool_path = os.path.join(self.spool_dir, f"{key}.{document_type}")
+        result = await self.render(document_type, title, content, outline, spool_path)
+        self.cache.set(key, result)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'in_progress': min(self._pending, max(self.workers, 1)),
+            'queued': max(0, self._pending - max(self.workers, 1)),
+            'rendered': self.rendered,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'spooled': self.spooled,
+            'pruned': self.pruned,
+            'restarts': self.restarts,
+            'cache': self.cache.stats(),
+            'coalesced': self.inflight.coalesced
+        }
+
+export_pool = ExportPool()
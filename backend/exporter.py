@@ -5,122 +5,140 @@ from pptx import Presentation
 from pptx.util import Inches as PptxInches, Pt as PptxPt
 from bs4 import BeautifulSoup
 import os
-import re
+import io
+import copy
+import hashlib
+import json
+import tempfile
 from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Union
+import markdown_ast
+from markdown_ast import HEADING, BULLET, NUMBERED, PARAGRAPH, BOLD, ITALIC, CODE
+from config import DOCX_TEMPLATE_PATH, PPTX_TEMPLATE_PATH
+
+# Bump whenever rendering output changes so cached exports are not reused
+EXPORTER_VERSION = '2'
+
+# python-docx default template list styles by nesting level
+DOCX_LIST_STYLES = {
+    'List Bullet': ('List Bullet', 'List Bullet 2', 'List Bullet 3'),
+    'List Number': ('List Number', 'List Number 2', 'List Number 3')
+}
+
+# Paragraph styles used by build_docx, each with the styles tried in its place when a
+# template does not define it (Word templates often leave them latent); None is 'Normal'
+DOCX_STYLE_FALLBACKS = {
+    'Title': ('Title', 'Heading 1'),
+    **{f'Heading {level}': tuple(f'Heading {lower}' for lower in range(level, 0, -1)) for level in range(1, 7)},
+    **{name: (name, base, 'List Paragraph') for base, names in DOCX_LIST_STYLES.items() for name in names}
+}
+
+@lru_cache(maxsize=None)
+def template_fingerprint(path: Optional[str]) -> str:
+    """Hash of a template file ('' for the library default), read once per process"""
+    if not path:
+        return ''
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def export_key(document_type: str, title: str, content: str, outline: str = None) -> str:
+    """Content hash identifying a rendered export"""
+    template = template_fingerprint(DOCX_TEMPLATE_PATH if document_type == 'docx' else PPTX_TEMPLATE_PATH)
+    # The pptx title slide shows the render date, so a new day means a new file (and ETag)
+    rendered_on = datetime.now().date().isoformat() if document_type == 'pptx' else None
+    payload = json.dumps([EXPORTER_VERSION, template, document_type, title, content, outline, rendered_on],
+                         separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def export_filename(title: str, document_type: str) -> str:
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"{title.replace(' ', '_')}_{timestamp}.{document_type}"
 
 class DocumentExporter:
-    def __init__(self, exports_dir: str = './exports'):
+    def __init__(self, exports_dir: str = './exports', docx_template: Optional[str] = None,
+                 pptx_template: Optional[str] = None):
         self.exports_dir = exports_dir
-        os.makedirs(exports_dir, exist_ok=True)
+        self.docx_template = docx_template
+        self.pptx_template = pptx_template
+        # Parsed base documents, loaded once per process and cloned for every export
+        self._docx_prototype = None
+        self._pptx_prototype = None
+        # DOCX_STYLE_FALLBACKS resolved against the styles the docx template defines
+        self._docx_styles = {}
     
-    def parse_markdown_line(self, line: str, doc: Document):
-        """Parse a single line of markdown and add to document"""
-        line = line.rstrip()
-        
-        # Skip empty lines
-        if not line.strip():
-            return
-        
-        # Headings
-        if line.startswith('# '):
-            doc.add_heading(line[2:], level=1)
-        elif line.startswith('## '):
-            doc.add_heading(line[3:], level=2)
-        elif line.startswith('### '):
-            doc.add_heading(line[4:], level=3)
-        # Bullet points
-        elif line.strip().startswith('•') or line.strip().startswith('- '):
-            text = line.strip()[2:] if line.strip().startswith('- ') else line.strip()[1:]
-            p = doc.add_paragraph(text.strip(), style='List Bullet')
-            self.apply_inline_formatting(p, text.strip())
-        # Numbered lists
-        elif re.match(r'^\d+\.\s', line.strip()):
-            text = re.sub(r'^\d+\.\s', '', line.strip())
-            p = doc.add_paragraph(text, style='List Number')
-            self.apply_inline_formatting(p, text)
-        # Regular paragraph
-        else:
-            p = doc.add_paragraph()
-            self.apply_inline_formatting(p, line)
+    def load_templates(self):
+        """Load the base document and presentation now rather than on the first export"""
+        if self._docx_prototype is None:
+            doc = Document(self.docx_template)
+            defined = {style.name for style in doc.styles}
+            self._docx_styles = {
+                name: next((candidate for candidate in candidates if candidate in defined), None)
+                for name, candidates in DOCX_STYLE_FALLBACKS.items()
+            }
+            self._docx_prototype = doc
+        if self._pptx_prototype is None:
+            prs = Presentation(self.pptx_template)
+            if not self.pptx_template:
+                prs.slide_width = PptxInches(10)
+                prs.slide_height = PptxInches(7.5)
+            self._pptx_prototype = prs
     
-    def apply_inline_formatting(self, paragraph, text: str):
-        """Apply bold, italic, and other inline formatting to paragraph"""
-        # Clear existing runs
-        paragraph.clear()
-        
-        # Parse inline markdown
-        parts = []
-        current_pos = 0
-        
-        # Find all bold (**text**) and italic (*text* or _text_)
-        bold_pattern = r'\*\*(.+?)\*\*'
-        italic_pattern = r'(?<!\*)\*(?!\*)(.+?)(?<!\*)\*(?!\*)|_(.+?)_'
-        code_pattern = r'`(.+?)`'
-        
-        # Combine patterns
-        combined_pattern = f'({bold_pattern})|({italic_pattern})|({code_pattern})'
-        
-        matches = list(re.finditer(combined_pattern, text))
-        
-        if not matches:
-            # No formatting, just add plain text
-            paragraph.add_run(text)
-            return
-        
-        # Process matches
-        for match in matches:
-            # Add text before match
-            if match.start() > current_pos:
-                paragraph.add_run(text[current_pos:match.start()])
-            
-            # Determine match type and add formatted text
-            if match.group(1):  # Bold
-                run = paragraph.add_run(match.group(2))
+    def new_document(self) -> Document:
+        """A fresh copy of the base document; cheaper than Document(), which unzips and parses the template"""
+        self.load_templates()
+        return copy.deepcopy(self._docx_prototype)
+    
+    def new_presentation(self) -> Presentation:
+        """A fresh copy of the base presentation"""
+        self.load_templates()
+        return copy.deepcopy(self._pptx_prototype)
+    
+    def add_runs(self, paragraph, spans):
+        """Add inline spans to a paragraph as formatted runs"""
+        for style, text in spans:
+            run = paragraph.add_run(text)
+            if style == BOLD:
                 run.bold = True
-            elif match.group(3) or match.group(4):  # Italic
-                content = match.group(4) if match.group(4) else match.group(5)
-                run = paragraph.add_run(content)
+            elif style == ITALIC:
                 run.italic = True
-            elif match.group(6):  # Code
-                run = paragraph.add_run(match.group(7))
+            elif style == CODE:
                 run.font.name = 'Courier New'
                 run.font.size = Pt(10)
-            
-            current_pos = match.end()
-        
-        # Add remaining text
-        if current_pos < len(text):
-            paragraph.add_run(text[current_pos:])
     
     def html_to_text(self, html_content: str) -> str:
         """Convert HTML to plain text"""
         soup = BeautifulSoup(html_content, 'html.parser')
         return soup.get_text()
     
-    def export_docx(self, title: str, content: str, outline: str = None) -> str:
-        """Export to .docx file with markdown support"""
-        doc = Document()
+    def build_docx(self, title: str, content: str, outline: str = None) -> Document:
+        """Build a .docx document with markdown support"""
+        doc = self.new_document()
         
         # Add title
-        title_para = doc.add_heading(title, 0)
-        
-        # Parse content line by line
-        lines = content.split('\n')
-        for line in lines:
-            self.parse_markdown_line(line, doc)
+        doc.add_paragraph(title, style=self._docx_styles['Title'])
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{title.replace(' ', '_')}_{timestamp}.docx"
-        filepath = os.path.join(self.exports_dir, filename)
+        for block in markdown_ast.parse(content):
+            if block.kind == HEADING:
+                doc.add_paragraph(block.text, style=self._docx_styles[f'Heading {block.level}'])
+            elif block.kind == BULLET:
+                style = self._docx_styles[DOCX_LIST_STYLES['List Bullet'][block.level]]
+                self.add_runs(doc.add_paragraph(style=style), block.spans)
+            elif block.kind == NUMBERED:
+                style = self._docx_styles[DOCX_LIST_STYLES['List Number'][block.level]]
+                self.add_runs(doc.add_paragraph(style=style), block.spans)
+            else:
+                self.add_runs(doc.add_paragraph(), block.spans)
         
-        doc.save(filepath)
-        return filepath
+        return doc
     
-    def export_pptx(self, title: str, content: str, outline: str = None) -> str:
-        """Export to .pptx file with professional formatting"""
-        prs = Presentation()
-        prs.slide_width = PptxInches(10)
-        prs.slide_height = PptxInches(7.5)
+    def export_docx(self, title: str, content: str, outline: str = None) -> str:
+        """Export to a .docx file in exports_dir"""
+        return self._save(self.build_docx(title, content, outline), export_filename(title, 'docx'))
+    
+    def build_pptx(self, title: str, content: str, outline: str = None) -> Presentation:
+        """Build a .pptx presentation with professional formatting"""
+        prs = self.new_presentation()
         
         # Title slide with professional styling
         title_slide_layout = prs.slide_layouts[0]
@@ -128,13 +146,10 @@ class DocumentExporter:
         title_shape = slide.shapes.title
         subtitle = slide.placeholders[1]
         
+        blocks = markdown_ast.parse(content)
+        
         # Extract main title from content or use provided title
-        main_title = title
-        lines = content.split('\n')
-        for line in lines:
-            if line.startswith('# '):
-                main_title = line[2:].strip()
-                break
+        main_title = next((block.text for block in blocks if block.kind == HEADING and block.level == 1), title)
         
         title_shape.text = main_title
         subtitle.text = f"Generated with DocForge AI • {datetime.now().strftime('%B %d, %Y')}"
@@ -145,73 +160,54 @@ class DocumentExporter:
                 paragraph.font.size = PptxPt(44)
                 paragraph.font.bold = True
         
-        # Parse markdown content into structured slides
+        # Group blocks into structured slides
         sections = []
         current_section = None
         skip_first_h1 = False  # Skip the main title if it's a H1
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        for block in blocks:
+            text = block.text
             
             # Main heading (H1) - Skip if it's the title, otherwise new slide
-            if line.startswith('# '):
+            if block.kind == HEADING and block.level == 1:
                 if not skip_first_h1:
                     skip_first_h1 = True
                     continue  # Skip the main title
                 if current_section and current_section['content']:
                     sections.append(current_section)
                 current_section = {
-                    'title': line[2:].strip(),
+                    'title': text,
                     'content': [],
                     'type': 'title'  # Section divider slide
                 }
             # Subheading (H2) - Content slide with bullets
-            elif line.startswith('## '):
+            elif block.kind == HEADING and block.level == 2:
                 if current_section and current_section['content']:
                     sections.append(current_section)
                 current_section = {
-                    'title': line[3:].strip(),
+                    'title': text,
                     'content': [],
                     'type': 'content'
                 }
             # Sub-subheading (H3) - Treat as bold bullet point
-            elif line.startswith('### '):
+            elif block.kind == HEADING and block.level == 3:
                 if current_section:
                     current_section['content'].append({
-                        'text': line[4:].strip(),
+                        'text': text,
                         'level': 0,
                         'bold': True
                     })
-            # Bullet points
-            elif line.startswith('•') or line.startswith('- '):
+            # Bullet points and numbered items, keeping their indentation level
+            elif block.kind in (BULLET, NUMBERED):
                 if current_section:
-                    text = line[2:] if line.startswith('- ') else line[1:]
-                    text = text.strip()
-                    # Clean markdown
-                    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
-                    text = re.sub(r'\*(.+?)\*', r'\1', text)
-                    text = re.sub(r'`(.+?)`', r'\1', text)
-                    
-                    # Determine indentation level
-                    level = 0
-                    if line.startswith('  ') or line.startswith('\t'):
-                        level = 1
-                    
                     current_section['content'].append({
-                        'text': text,
-                        'level': level,
+                        'text': f"{block.number}. {text}" if block.kind == NUMBERED else text,
+                        'level': block.level,
                         'bold': False
                     })
             # Regular paragraphs - add as bullet if not too long
-            elif len(line) > 15 and not line.startswith('#'):
+            elif block.kind == PARAGRAPH and len(text) > 15:
                 if current_section:
-                    # Clean markdown
-                    text = re.sub(r'\*\*(.+?)\*\*', r'\1', line)
-                    text = re.sub(r'\*(.+?)\*', r'\1', text)
-                    text = re.sub(r'`(.+?)`', r'\1', text)
-                    
                     # Split long paragraphs into multiple bullets
                     if len(text) > 150:
                         # Split by sentences
@@ -290,11 +286,51 @@ class DocumentExporter:
                     p.space_before = PptxPt(6)
                     p.space_after = PptxPt(6)
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{title.replace(' ', '_')}_{timestamp}.pptx"
+        return prs
+    
+    def export_pptx(self, title: str, content: str, outline: str = None) -> str:
+        """Export to a .pptx file in exports_dir"""
+        return self._save(self.build_pptx(title, content, outline), export_filename(title, 'pptx'))
+    
+    def render(self, document_type: str, title: str, content: str, outline: str = None) -> bytes:
+        """Render an export into memory and return the file bytes"""
+        if document_type == 'docx':
+            document = self.build_docx(title, content, outline)
+        elif document_type == 'pptx':
+            document = self.build_pptx(title, content, outline)
+        else:
+            raise ValueError(f"Invalid document type: {document_type}")
+        buffer = io.BytesIO()
+        document.save(buffer)
+        return buffer.getvalue()
+    
+    def _save(self, document, filename: str) -> str:
+        os.makedirs(self.exports_dir, exist_ok=True)
         filepath = os.path.join(self.exports_dir, filename)
-        
-        prs.save(filepath)
+        document.save(filepath)
         return filepath
 
-exporter = DocumentExporter()
+exporter = DocumentExporter(docx_template=DOCX_TEMPLATE_PATH, pptx_template=PPTX_TEMPLATE_PATH)
+
+def load_templates():
+    """Export pool worker initializer: parse the base templates before the first export"""
+    exporter.load_templates()
+
+def render_export(document_type: str, title: str, content: str, outline: str = None,
+                  spool_path: Optional[str] = None, spool_threshold: Optional[int] = None) -> Union[bytes, str]:
+    """Render an export with this process's exporter; the entry point for export pool workers.
+
+    Returns the file bytes, or, when they exceed `spool_threshold`, writes them to
+    `spool_path` and returns that path, so large exports are not copied back
+    through the worker pipe and held in the API process's memory.
+    """
+    data = exporter.render(document_type, title, content, outline)
+    if spool_path is None or spool_threshold is None or len(data) <= spool_threshold:
+        return data
+    spool_dir = os.path.dirname(spool_path) or '.'
+    os.makedirs(spool_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.export-', dir=spool_dir)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, spool_path)
+    return spool_path
@@ -0,0 +1,24 @@
+import firebase_admin
+from firebase_admin import credentials
+from config import FIREBASE_SERVICE_ACCOUNT, FIRESTORE_PROJECT_ID
+
+def get_firebase_app() -> firebase_admin.App:
+    """Return the default Firebase app, initialising it on first use.
+
+    Without a service account (SQLite storage) the app only carries the
+    project id, which is all ID token verification needs. Set
+    FIREBASE_AUTH_EMULATOR_HOST to verify tokens issued by the Auth emulator.
+    """
+    try:
+        return firebase_admin.get_app()
+    except ValueError:
+        pass
+    
+    try:
+        if FIREBASE_SERVICE_ACCOUNT:
+            # Initialize Firebase with the parsed credentials (dict)
+            return firebase_admin.initialize_app(credentials.Certificate(FIREBASE_SERVICE_ACCOUNT))
+        return firebase_admin.initialize_app(options={'projectId': FIRESTORE_PROJECT_ID})
+    except Exception as e:
+        print(f"WARNING: Firebase initialization failed: {e}")
+        raise
@@ -1,30 +1,23 @@
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
-from config import FIREBASE_SERVICE_ACCOUNT, FIRESTORE_PROJECT_ID
+import asyncio
+from firebase_admin import firestore, firestore_async
+from firebase_app import get_firebase_app
+from storage import (
+    StorageBackend, decode_cursor, encode_cursor,
+    PROJECT_META_FIELDS, PROJECT_LIST_FIELDS, VERSION_LIST_FIELDS, SECTION_FIELDS
+)
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from google.api_core.exceptions import NotFound
+from typing import Optional, List, Dict, Tuple
 
-# Initialize Firebase with the parsed credentials (dict)
-try:
-    cred = credentials.Certificate(FIREBASE_SERVICE_ACCOUNT)
-    firebase_admin.initialize_app(cred)
-except Exception as e:
-    print(f"WARNING: Firebase initialization failed: {e}")
-    raise
+# Firestore accepts at most 500 writes and 10 MiB per batch; leave payload headroom
+FIRESTORE_BATCH_MAX_WRITES = 500
+FIRESTORE_BATCH_MAX_BYTES = 8 * 1024 * 1024
 
-db = firestore.client()
-
-class FirestoreDB:
+class FirestoreDB(StorageBackend):
     def __init__(self):
-        self.db = db
-    
-    async def verify_token(self, token: str) -> dict:
-        """Verify Firebase ID token"""
-        try:
-            decoded_token = auth.verify_id_token(token)
-            return decoded_token
-        except Exception as e:
-            raise Exception(f"Token verification failed: {str(e)}")
+        super().__init__()
+        # Async (grpc.aio) client so Firestore round trips never block the event loop
+        self.db = firestore_async.client(get_firebase_app())
     
     async def create_project(self, user_id: str, data: dict) -> str:
         """Create a new project"""
@@ -34,74 +27,125 @@ class FirestoreDB:
             'user_id': user_id,
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow(),
-            'content': ''
+            'content': '',
+            'version_count': 0
         }
-        project_ref.set(project_data)
+        await project_ref.set(project_data)
         return project_ref.id
     
     async def get_project(self, project_id: str) -> Optional[dict]:
         """Get project by ID"""
-        doc = self.db.collection('projects').document(project_id).get()
+        doc = await self.db.collection('projects').document(project_id).get()
         if doc.exists:
             data = doc.to_dict()
             data['id'] = doc.id
             return data
         return None
     
-    async def get_user_projects(self, user_id: str) -> List[dict]:
-        """Get all projects for a user"""
-        projects = []
-        docs = self.db.collection('projects').where('user_id', '==', user_id).stream()
-        for doc in docs:
+    async def get_user_projects(self, user_id: str, limit: int,
+                                cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Get a page of a user's projects, most recently updated first.
+
+        Needs the composite index user_id ASC, updated_at DESC, __name__ DESC.
+        """
+        query = (self.db.collection('projects')
+                 .where('user_id', '==', user_id)
+                 .select(PROJECT_LIST_FIELDS))
+        return await self._page(query, 'updated_at', limit, cursor)
+    
+    async def _page(self, query, order_field: str, limit: int,
+                    cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Run `query` newest-first on `order_field` (document id as tie-breaker) and return one page"""
+        query = (query.order_by(order_field, direction=firestore.Query.DESCENDING)
+                 .order_by('__name__', direction=firestore.Query.DESCENDING))
+        if cursor:
+            query = query.start_after(decode_cursor(cursor))
+        
+        items = []
+        # Fetch one extra document to learn whether another page exists
+        async for doc in query.limit(limit + 1).stream():
             data = doc.to_dict()
             data['id'] = doc.id
-            projects.append(data)
-        return projects
+            items.append(data)
+        
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        last = items[-1]
+        return items, encode_cursor({order_field: last[order_field], '__name__': last['id']})
+    
+    async def _read_project_meta(self, project_id: str) -> Optional[dict]:
+        doc = await self.db.collection('projects').document(project_id).get(PROJECT_META_FIELDS)
+        if not doc.exists:
+            return None
+        meta = doc.to_dict()
+        meta['id'] = doc.id
+        return meta
     
     async def update_project(self, project_id: str, data: dict) -> None:
         """Update project"""
-        self.db.collection('projects').document(project_id).update({
+        await self.db.collection('projects').document(project_id).update({
             **data,
             'updated_at': datetime.utcnow()
         })
+        self.project_meta.invalidate(project_id)
     
     async def create_version(self, project_id: str, content: str, metadata: dict = None) -> str:
-        """Save a version of the project"""
-        versions_ref = self.db.collection('projects').document(project_id).collection('versions')
+        """Save a version of the project.
+
+        Version numbers come from a `version_count` counter on the project
+        document, bumped in the same transaction that writes the version, so
+        concurrent saves always get distinct, consecutive numbers. The content
+        is stored as a compressed delta against the previous version, with a
+        full keyframe every VERSION_KEYFRAME_INTERVAL versions.
+        """
+        project_ref = self.db.collection('projects').document(project_id)
+        versions_ref = project_ref.collection('versions')
         
-        existing_versions = versions_ref.stream()
-        version_number = len(list(existing_versions)) + 1
+        project = await project_ref.get(['version_count'])
+        legacy_count = None
+        if (project.to_dict() or {}).get('version_count') is None:
+            # Projects saved before the counter existed: seed it with a count aggregation
+            legacy_count = (await versions_ref.count().get())[0][0].value
         
         version_ref = versions_ref.document()
-        version_data = {
-            'version_number': version_number,
-            'content': content,
-            'created_at': datetime.utcnow(),
-            'metadata': metadata or {}
-        }
-        version_ref.set(version_data)
+        
+        @firestore_async.async_transactional
+        async def save(transaction) -> None:
+            snapshot = await project_ref.get(['version_count', 'latest_version'], transaction=transaction)
+            state = snapshot.to_dict() or {}
+            current = state.get('version_count')
+            version_number = (current if current is not None else legacy_count or 0) + 1
+            
+            # Versions are immutable, so the base can be read outside the transaction
+            stored = await self._encode_next_version(project_id, content, state.get('latest_version'))
+            
+            transaction.set(version_ref, {
+                'version_number': version_number,
+                **stored,
+                'created_at': datetime.utcnow(),
+                'metadata': metadata or {}
+            })
+            transaction.set(project_ref, {
+                'version_count': version_number,
+                'latest_version': {'id': version_ref.id, 'chain_length': stored['chain_length']}
+            }, merge=True)
+        
+        await save(self.db.transaction())
+        self.version_content.set((project_id, version_ref.id), content)
         return version_ref.id
     
-    async def get_versions(self, project_id: str) -> List[dict]:
-        """Get all versions for a project"""
-        versions = []
-        docs = (self.db.collection('projects').document(project_id)
-                .collection('versions').order_by('created_at', direction=firestore.Query.DESCENDING).stream())
-        for doc in docs:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            versions.append(data)
-        return versions
+    async def get_versions(self, project_id: str, limit: int,
+                           cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Get a page of version metadata, newest first, without version content"""
+        query = (self.db.collection('projects').document(project_id)
+                 .collection('versions').select(VERSION_LIST_FIELDS))
+        return await self._page(query, 'version_number', limit, cursor)
     
-    async def get_version(self, project_id: str, version_id: str) -> Optional[dict]:
-        """Get a specific version"""
-        doc = (self.db.collection('projects').document(project_id)
-               .collection('versions').document(version_id).get())
-        if doc.exists:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            return data
-        return None
+    async def _read_version(self, project_id: str, version_id: str) -> Optional[dict]:
+        doc = await (self.db.collection('projects').document(project_id)
+                     .collection('versions').document(version_id).get())
+        return doc.to_dict() if doc.exists else None
     
     async def create_comment(self, project_id: str, user_id: str, text: str) -> str:
         """Add a comment to a project"""
@@ -112,7 +156,7 @@ class FirestoreDB:
             'text': text,
             'created_at': datetime.utcnow()
         }
-        comment_ref.set(comment_data)
+        await comment_ref.set(comment_data)
         return comment_ref.id
     
     async def get_comments(self, project_id: str) -> List[dict]:
@@ -120,7 +164,7 @@ class FirestoreDB:
         comments = []
         docs = (self.db.collection('projects').document(project_id)
                 .collection('comments').order_by('created_at', direction=firestore.Query.DESCENDING).stream())
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             data['id'] = doc.id
             comments.append(data)
@@ -136,7 +180,7 @@ class FirestoreDB:
             'content': content,
             'created_at': datetime.utcnow()
         }
-        feedback_ref.set(feedback_data)
+        await feedback_ref.set(feedback_data)
     
     # New methods for section-by-section workflow
     async def create_section(self, project_id: str, section_data: dict) -> str:
@@ -145,15 +189,91 @@ class FirestoreDB:
                        .collection('sections').document())
         section_data['created_at'] = datetime.utcnow()
         section_data['updated_at'] = datetime.utcnow()
-        section_ref.set(section_data)
+        await section_ref.set(section_data)
         return section_ref.id
     
-    async def get_sections(self, project_id: str) -> List[dict]:
-        """Get all sections for a project, ordered by order field"""
+    def _write_chunks(self, items: list, reserved_writes: int = 0) -> List[list]:
+        """Split writes into chunks that fit Firestore's per-batch write and payload limits"""
+        max_writes = FIRESTORE_BATCH_MAX_WRITES - reserved_writes
+        chunks, current, current_bytes = [], [], 0
+        for item in items:
+            size = len(repr(item))
+            if current and (len(current) >= max_writes or
+                            current_bytes + size > FIRESTORE_BATCH_MAX_BYTES):
+                chunks.append(current)
+                current, current_bytes = [], 0
+            current.append(item)
+            current_bytes += size
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    async def create_sections(self, project_id: str, sections: List[dict], checkpoint: bool = False) -> List[str]:
+        """Create many sections with batched writes; returns their ids in input order.
+        
+        With `checkpoint`, each batch also records its sections as completed in the
+        project's generation plan, so a section and its checkpoint land atomically.
+        """
+        project_ref = self.db.collection('projects').document(project_id)
+        sections_ref = project_ref.collection('sections')
+        now = datetime.utcnow()
+        
+        refs = [sections_ref.document(section_data.get('id')) for section_data in sections]
+        batches = []
+        for chunk in self._write_chunks(list(zip(refs, sections)), reserved_writes=1 if checkpoint else 0):
+            batch = self.db.batch()
+            for section_ref, section_data in chunk:
+                fields = {key: value for key, value in section_data.items() if key != 'id'}
+                batch.set(section_ref, {**fields, 'created_at': now, 'updated_at': now})
+            if checkpoint:
+                planned = [section_data['plan_index'] for _, section_data in chunk]
+                batch.update(project_ref, {
+                    'generation.completed': firestore.ArrayUnion(planned),
+                    'generation.pending': firestore.ArrayRemove(planned),
+                    'generation.updated_at': now
+                })
+            batches.append(batch)
+        
+        await asyncio.gather(*(batch.commit() for batch in batches))
+        return [section_ref.id for section_ref in refs]
+    
+    async def update_sections(self, project_id: str, updates: Dict[str, dict]) -> None:
+        """Update many sections (section_id -> fields) with batched writes"""
+        sections_ref = self.db.collection('projects').document(project_id).collection('sections')
+        now = datetime.utcnow()
+        
+        batches = []
+        for chunk in self._write_chunks(list(updates.items())):
+            batch = self.db.batch()
+            for section_id, data in chunk:
+                batch.update(sections_ref.document(section_id), {**data, 'updated_at': now})
+            batches.append(batch)
+        
+        await asyncio.gather(*(batch.commit() for batch in batches))
+    
+    async def get_interrupted_generations(self) -> List[dict]:
+        """Get projects whose generation was still running when last checkpointed"""
+        projects = []
+        docs = self.db.collection('projects').where('generation.status', '==', 'running').stream()
+        async for doc in docs:
+            data = doc.to_dict()
+            data['id'] = doc.id
+            projects.append(data)
+        return projects
+    
+    async def get_sections(self, project_id: str, include_comments: bool = True) -> List[dict]:
+        """Get all sections for a project, ordered by order field.
+
+        With include_comments=False the comment bodies are left out of the
+        read (only `comment_count` is fetched), which keeps large threads off
+        the wire when the caller only needs section content.
+        """
         sections = []
-        docs = (self.db.collection('projects').document(project_id)
-                .collection('sections').order_by('order').stream())
-        for doc in docs:
+        query = self.db.collection('projects').document(project_id).collection('sections')
+        if not include_comments:
+            query = query.select(SECTION_FIELDS)
+        docs = query.order_by('order').stream()
+        async for doc in docs:
             data = doc.to_dict()
             data['id'] = doc.id
             sections.append(data)
@@ -161,8 +281,8 @@ class FirestoreDB:
     
     async def get_section(self, project_id: str, section_id: str) -> Optional[dict]:
         """Get a specific section"""
-        doc = (self.db.collection('projects').document(project_id)
-               .collection('sections').document(section_id).get())
+        doc = await (self.db.collection('projects').document(project_id)
+                     .collection('sections').document(section_id).get())
         if doc.exists:
             data = doc.to_dict()
             data['id'] = doc.id
@@ -171,26 +291,29 @@ class FirestoreDB:
     
     async def update_section(self, project_id: str, section_id: str, data: dict) -> None:
         """Update section content and metadata"""
-        self.db.collection('projects').document(project_id).collection('sections').document(section_id).update({
+        await self.db.collection('projects').document(project_id).collection('sections').document(section_id).update({
             **data,
             'updated_at': datetime.utcnow()
         })
     
-    async def add_section_comment(self, project_id: str, section_id: str, comment: str) -> None:
-        """Add a comment to a section"""
+    async def add_section_comment(self, project_id: str, section_id: str, comment: str) -> bool:
+        """Append a comment to a section atomically; returns False if the section does not exist.
+
+        A single server-side ArrayUnion + Increment, so concurrent comments never
+        overwrite each other and no read is needed first.
+        """
         section_ref = (self.db.collection('projects').document(project_id)
                        .collection('sections').document(section_id))
-        section_doc = section_ref.get()
-        if section_doc.exists:
-            current_comments = section_doc.to_dict().get('comments', [])
-            current_comments.append({
-                'text': comment,
-                'created_at': datetime.utcnow()
-            })
-            section_ref.update({
-                'comments': current_comments,
+        try:
+            await section_ref.update({
+                'comments': firestore.ArrayUnion([{
+                    'text': comment,
+                    'created_at': datetime.utcnow()
+                }]),
+                'comment_count': firestore.Increment(1),
                 'updated_at': datetime.utcnow()
             })
-
-firestore_db = FirestoreDB()
+        except NotFound:
+            return False
+        return True
 
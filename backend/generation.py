@@ -0,0 +1,311 @@
+import asyncio
+import re
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
+from ai_client import ai_client
+from database import db
+from config import (
+    SECTION_GENERATION_CONCURRENCY, GENERATION_MAX_CONCURRENCY,
+    SECTION_BATCH_SIZE, SECTION_BATCH_MAX_SIZE, SECTION_WRITE_BATCH_SIZE, SECTION_WRITE_MAX_DELAY
+)
+
+# Top-level outline entries: "1. Title" / "## 2) Title" / "**3. Title**" (not "1.1 Subsection")
+DOCX_SECTION_PATTERN = re.compile(r'^\s*(?:#+\s*)?(?:\*\*)?\d+[.)](?!\d)\s*(.+?)(?:\*\*)?\s*$')
+# Slide entries: "Slide 1: Title" / "**Slide 2 - [Title]**"
+PPTX_SECTION_PATTERN = re.compile(r'^\s*(?:#+\s*)?(?:\*\*)?Slide\s+\d+\s*[:.\-–]\s*(.+?)(?:\*\*)?\s*$',
+                                  re.IGNORECASE)
+
+# Caps in-flight section generations across all requests in this process
+_global_slots = asyncio.Semaphore(GENERATION_MAX_CONCURRENCY)
+
+# Projects whose sections are being generated by this process
+_active_projects = set()
+
+def resolve_concurrency(requested: Optional[int] = None) -> int:
+    """Clamp a per-request concurrency to [1, GENERATION_MAX_CONCURRENCY]"""
+    value = requested or SECTION_GENERATION_CONCURRENCY
+    return max(1, min(value, GENERATION_MAX_CONCURRENCY))
+
+def resolve_batch_size(requested: Optional[int] = None) -> int:
+    """Clamp a per-request batch size to [1, SECTION_BATCH_MAX_SIZE]"""
+    value = requested or SECTION_BATCH_SIZE
+    return max(1, min(value, SECTION_BATCH_MAX_SIZE))
+
+async def generate_sections(titles: List[str], doc_type: str, context: str = "",
+                            concurrency: Optional[int] = None, bypass_cache: bool = False,
+                            batch_size: Optional[int] = None,
+                            on_result: Optional[Callable[[dict], Awaitable[None]]] = None,
+                            orders: Optional[List[int]] = None) -> List[dict]:
+    """Generate content for every title concurrently with bounded parallelism.
+
+    With a batch size above 1, titles are grouped into single multi-section LLM
+    calls; any section missing from a batch response is regenerated on its own.
+
+    Returns one result per title in input order. A failed section does not fail
+    the batch; its result carries an 'error' message and no content. `on_result`
+    is awaited with each result as soon as that section finishes. Results are
+    numbered by `orders` when given (e.g. when only some sections are regenerated),
+    otherwise by position.
+    """
+    request_slots = asyncio.Semaphore(resolve_concurrency(concurrency))
+    batch_size = resolve_batch_size(batch_size)
+    orders = orders if orders is not None else list(range(len(titles)))
+
+    async def finish(result: dict) -> dict:
+        if on_result:
+            await on_result(result)
+        return result
+
+    async def run(idx: int) -> dict:
+        title = titles[idx]
+        async with request_slots, _global_slots:
+            try:
+                content = await ai_client.generate_section_content(title, doc_type, context, bypass_cache)
+                result = {'order': orders[idx], 'title': title, 'content': content, 'error': None}
+            except Exception as e:
+                result = {'order': orders[idx], 'title': title, 'content': None, 'error': str(e)}
+        return await finish(result)
+
+    async def run_batch(indices: List[int]) -> List[dict]:
+        if len(indices) == 1:
+            return [await run(indices[0])]
+        async with request_slots, _global_slots:
+            try:
+                contents = await ai_client.generate_sections_batch(
+                    [titles[idx] for idx in indices], doc_type, context, bypass_cache)
+            except Exception:
+                contents = {}
+
+        results = {}
+        for i, idx in enumerate(indices):
+            if i in contents:
+                results[idx] = await finish(
+                    {'order': orders[idx], 'title': titles[idx], 'content': contents[i], 'error': None})
+        missing = [idx for idx in indices if idx not in results]
+        for idx, result in zip(missing, await asyncio.gather(*(run(idx) for idx in missing))):
+            results[idx] = result
+        return [results[idx] for idx in indices]
+
+    if batch_size == 1:
+        return await asyncio.gather(*(run(idx) for idx in range(len(titles))))
+
+    batches = await asyncio.gather(*(
+        run_batch(list(range(start, min(start + batch_size, len(titles)))))
+        for start in range(0, len(titles), batch_size)
+    ))
+    return [result for batch in batches for result in batch]
+
+def parse_outline(outline: str, doc_type: str) -> List[dict]:
+    """Split an outline from generate_outline into [{'title', 'points'}] per top-level section.
+
+    Sections are entries at the indentation of the first one; more deeply
+    indented entries ("   1. Background") are points of the current section.
+    """
+    pattern = DOCX_SECTION_PATTERN if doc_type == 'docx' else PPTX_SECTION_PATTERN
+    sections = []
+    section_indent = None
+    for line in outline.splitlines():
+        expanded = line.expandtabs(4)
+        indent = len(expanded) - len(expanded.lstrip())
+        match = pattern.match(line)
+        if match and (section_indent is None or indent <= section_indent):
+            if section_indent is None:
+                section_indent = indent
+            title = match.group(1).strip().strip('[]*').strip()
+            if title:
+                sections.append({'title': title, 'points': []})
+        elif sections and line.strip():
+            sections[-1]['points'].append(line.strip())
+    return sections
+
+async def generate_pipelined_document(prompt: str, doc_type: str, outline: Optional[str] = None,
+                                      concurrency: Optional[int] = None) -> Optional[dict]:
+    """Generate a full document one outline section per LLM call, all concurrently.
+
+    Produces the same '#' title / '##' section markdown as the single-completion
+    AIClient.generate_full_document, so total time tracks the slowest section
+    rather than the whole document length. Returns None when the outline has no
+    recognisable sections, leaving the caller to fall back to a single completion.
+    """
+    if not outline:
+        outline = await ai_client.generate_outline(prompt, doc_type)
+    sections = parse_outline(outline, doc_type)
+    if not sections:
+        return None
+
+    def section_context(section: dict) -> str:
+        if not section['points']:
+            return prompt
+        points = "\n".join(section['points'])
+        return f"{prompt}\n\nCover these points from the outline:\n{points}"
+
+    request_slots = asyncio.Semaphore(resolve_concurrency(concurrency))
+
+    async def run(section: dict) -> str:
+        async with request_slots, _global_slots:
+            return await ai_client.generate_section_content(
+                section['title'], doc_type, section_context(section))
+
+    title, *contents = await asyncio.gather(
+        ai_client.generate_document_title(prompt, doc_type),
+        *(run(section) for section in sections)
+    )
+
+    parts = [f"# {title}"]
+    for section, content in zip(sections, contents):
+        parts.append(f"## {section['title']}\n\n{content.strip()}")
+    return {
+        'content': "\n\n".join(parts) + "\n",
+        'outline': outline,
+        'model': ai_client.model
+    }
+
+def generation_plan(titles: List[str], doc_type: str, context: str = "") -> dict:
+    """Checkpoint stored on the project so an interrupted generation can be resumed"""
+    return {
+        'status': 'running',  # 'running', 'complete', 'partial' or 'cancelled'
+        'doc_type': doc_type,
+        'context': context,
+        'planned': titles,
+        'completed': [],
+        'pending': list(range(len(titles))),
+        'failed': [],
+        'updated_at': datetime.utcnow()
+    }
+
+def planned_section_id(project_id: str, plan_index: int) -> str:
+    """Deterministic id of a generated section, so re-written batches replace rather than duplicate"""
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"docforge:{project_id}/sections/{plan_index}").hex
+
+def is_generating(project_id: str) -> bool:
+    return project_id in _active_projects
+
+async def missing_sections(project: dict) -> Tuple[List[int], List[str]]:
+    """Plan indexes and titles of planned sections that were never written.
+
+    Sections are matched by 'plan_index', which reordering leaves alone; sections
+    written before it was stored were still in plan order.
+    """
+    plan = project.get('generation') or {}
+    sections = await db.get_sections(project['id'], include_comments=False)
+    existing = {section['plan_index'] if 'plan_index' in section else section['order'] for section in sections}
+    missing = [(order, title) for order, title in enumerate(plan.get('planned', [])) if order not in existing]
+    return [order for order, _ in missing], [title for _, title in missing]
+
+class SectionWriter:
+    """Buffers generated sections and persists them with batched, checkpointed writes.
+
+    A batch is flushed once it holds `batch_size` sections or its oldest section
+    has waited `max_delay` seconds, so large decks persist in a handful of RPCs
+    while early sections still show up in the Editor promptly.
+    """
+
+    def __init__(self, project_id: str, batch_size: int = SECTION_WRITE_BATCH_SIZE,
+                 max_delay: float = SECTION_WRITE_MAX_DELAY,
+                 on_written: Optional[Callable[[dict], Awaitable[None]]] = None):
+        self.project_id = project_id
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self.on_written = on_written
+        self._buffer: List[dict] = []
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def add(self, result: dict) -> None:
+        self._buffer.append(result)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception:
+            pass  # Sections stay buffered and are retried by the next flush
+
+    def cancel(self) -> None:
+        """Stop a pending delayed flush; buffered sections are dropped"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._buffer = []
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if self._timer is not None and self._timer is not asyncio.current_task():
+                self._timer.cancel()
+                self._timer = None
+            results, self._buffer = self._buffer, []
+            if not results:
+                return
+            try:
+                section_ids = await db.create_sections(self.project_id, [{
+                    'id': planned_section_id(self.project_id, result['order']),
+                    'title': result['title'],
+                    'content': result['content'],
+                    'order': result['order'],
+                    'plan_index': result['order'],
+                    'feedback': None,
+                    'comments': [],
+                    'comment_count': 0
+                } for result in results], checkpoint=True)
+            except Exception:
+                # Sections carry deterministic ids, so re-writing ones that did land is harmless
+                self._buffer = results + self._buffer
+                raise
+        for result, section_id in zip(results, section_ids):
+            result['section_id'] = section_id
+            if self.on_written:
+                await self.on_written(result)
+
+async def generate_project_sections(project_id: str, titles: List[str], doc_type: str, context: str = "",
+                                    concurrency: Optional[int] = None, bypass_cache: bool = False,
+                                    batch_size: Optional[int] = None,
+                                    on_section: Optional[Callable[[dict], Awaitable[None]]] = None,
+                                    orders: Optional[List[int]] = None) -> List[dict]:
+    """Generate sections and persist them in batches as they finish.
+
+    Every write also checkpoints the project's generation plan, and the plan is
+    closed as 'complete' or 'partial' at the end, so a crash mid-way leaves a
+    record of exactly which sections are still missing.
+
+    `on_section` receives every result once it is settled, with the new
+    'section_id' (None on failure). Returns the failed sections as
+    {'order', 'title', 'error'}.
+    """
+    failed_sections = []
+    writer = SectionWriter(project_id, on_written=on_section)
+
+    async def persist(result: dict) -> None:
+        if not result['error']:
+            await writer.add(result)
+            return
+        result['section_id'] = None
+        failed_sections.append({
+            'order': result['order'],
+            'title': result['title'],
+            'error': result['error']
+        })
+        if on_section:
+            await on_section(result)
+
+    _active_projects.add(project_id)
+    try:
+        await generate_sections(titles, doc_type, context, concurrency, bypass_cache, batch_size,
+                                persist, orders)
+        await writer.flush()
+        failed_sections.sort(key=lambda section: section['order'])
+        await db.update_project(project_id, {
+            'generation.status': 'partial' if failed_sections else 'complete',
+            'generation.failed': [section['order'] for section in failed_sections],
+            'generation.updated_at': datetime.utcnow()
+        })
+        return failed_sections
+    finally:
+        # A cancelled or failed generation must not keep writing sections after it ends
+        writer.cancel()
+        _active_projects.discard(project_id)
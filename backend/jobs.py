@@ -0,0 +1,162 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from config import JOB_WORKERS, JOB_QUEUE_LIMIT, JOB_RETENTION_SECONDS
+
+# Terminal job states; everything else is 'queued' or 'running'
+FINISHED_STATUSES = {'succeeded', 'partial', 'failed', 'cancelled', 'interrupted'}
+
+class JobQueueFull(Exception):
+    """Raised when no more jobs can be queued"""
+
+class JobConflict(Exception):
+    """Raised when a project already has a queued or running job"""
+
+class JobManager:
+    """In-process background job queue served by a fixed pool of asyncio workers.
+
+    A job is a plain dict that its runner updates in place to report progress;
+    GET /jobs/{id} returns a snapshot of it. Jobs live in memory only, so they
+    are visible to the process that accepted them.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, queue_limit: int = JOB_QUEUE_LIMIT,
+                 retention_seconds: float = JOB_RETENTION_SECONDS):
+        self.worker_count = workers
+        self.queue_limit = queue_limit
+        self.retention_seconds = retention_seconds
+        self.jobs: Dict[str, dict] = {}
+        self._runners: Dict[str, Callable[[dict], Awaitable[Any]]] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_limit)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in self.jobs.values():
+            if job['status'] in ('queued', 'running'):
+                self._finish(job, 'interrupted', error='Server shut down before the job finished')
+
+    def check_capacity(self) -> None:
+        """Raise JobQueueFull if a job submitted now would be rejected, before callers create state for it"""
+        if self._queue is not None and self._queue.full():
+            raise JobQueueFull("Too many generation jobs are queued, please retry shortly")
+
+    def submit(self, kind: str, user_id: str, runner: Callable[[dict], Awaitable[Any]], **fields) -> dict:
+        """Queue `runner(job)`; its return value becomes the job result"""
+        if self._queue is None:
+            raise RuntimeError("Job workers are not running")
+        if fields.get('project_id') and self.live_job(fields['project_id']):
+            raise JobConflict("Generation is already queued or running for this project")
+        self._prune()
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'user_id': user_id,
+            'status': 'queued',
+            'project_id': None,
+            'total': 0,
+            'completed': 0,
+            'failed': 0,
+            'sections': [],
+            'result': None,
+            'error': None,
+            'created_at': datetime.utcnow(),
+            'started_at': None,
+            'finished_at': None,
+            **fields
+        }
+        try:
+            self._queue.put_nowait(job['id'])
+        except asyncio.QueueFull:
+            raise JobQueueFull("Too many generation jobs are queued, please retry shortly")
+        self.jobs[job['id']] = job
+        self._runners[job['id']] = runner
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.jobs.get(job_id)
+
+    def live_job(self, project_id: str) -> Optional[dict]:
+        """The queued or running job for a project, if any"""
+        for job in self.jobs.values():
+            if job['project_id'] == project_id and job['status'] not in FINISHED_STATUSES:
+                return job
+        return None
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it already finished"""
+        job = self.jobs.get(job_id)
+        if not job or job['status'] in FINISHED_STATUSES:
+            return False
+        self._finish(job, 'cancelled')
+        task = self._running.get(job_id)
+        if task:
+            task.cancel()
+        return True
+
+    def stats(self) -> dict:
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job['status']] = statuses.get(job['status'], 0) + 1
+        return {
+            'workers': len(self._workers),
+            'queued': self._queue.qsize() if self._queue else 0,
+            'running': len(self._running),
+            'jobs': statuses
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = self.jobs.get(job_id)
+        runner = self._runners.pop(job_id, None)
+        if job is None or runner is None or job['status'] != 'queued':
+            return  # Cancelled while queued
+
+        job['status'] = 'running'
+        job['started_at'] = datetime.utcnow()
+        task = asyncio.create_task(runner(job))
+        self._running[job_id] = task
+        try:
+            result = await task
+            if job['status'] == 'running':
+                job['result'] = result
+                self._finish(job, 'partial' if job['failed'] else 'succeeded')
+        except asyncio.CancelledError:
+            if job['status'] != 'cancelled':
+                raise  # The worker itself is shutting down
+        except Exception as e:
+            self._finish(job, 'failed', error=str(e))
+        finally:
+            self._running.pop(job_id, None)
+
+    def _finish(self, job: dict, status: str, error: Optional[str] = None) -> None:
+        job['status'] = status
+        job['error'] = error
+        job['finished_at'] = datetime.utcnow()
+        job['_finished_monotonic'] = time.monotonic()
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - self.retention_seconds
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job['status'] in FINISHED_STATUSES and job.get('_finished_monotonic', cutoff) < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+job_manager = JobManager()
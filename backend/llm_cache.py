@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+from cache import TTLCache
+from config import (
+    LLM_CACHE_ENABLED, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_BYTES,
+    LLM_CACHE_PATH, LLM_CACHE_DISK_MAX_BYTES
+)
+
+def request_fingerprint(model: str, messages: list) -> str:
+    """Content address of an LLM request: a hash of the model plus messages"""
+    payload = json.dumps({'model': model, 'messages': messages}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class DiskCacheTier:
+    """Persistent SQLite tier that survives restarts, evicted by TTL and total size"""
+
+    def __init__(self, path: str, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS llm_cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+            'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)')
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE llm_cache SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, value, size, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)', (key, value, size, now + self.ttl, now)
+            )
+            self._conn.execute('DELETE FROM llm_cache WHERE expires_at <= ?', (now,))
+            total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM llm_cache').fetchone()[0]
+            if total > self.max_bytes:
+                # Drop least recently used rows until back under budget
+                excess = total - self.max_bytes
+                freed = 0
+                stale = []
+                for row_key, row_size in self._conn.execute(
+                        'SELECT key, size FROM llm_cache ORDER BY accessed_at'):
+                    if freed >= excess:
+                        break
+                    stale.append((row_key,))
+                    freed += row_size
+                self._conn.executemany('DELETE FROM llm_cache WHERE key = ?', stale)
+            self._conn.commit()
+
+class LLMCache:
+    """Two-tier cache for LLM completions: in-memory LRU in front of optional SQLite"""
+
+    def __init__(self):
+        self.enabled = LLM_CACHE_ENABLED
+        self.memory = TTLCache(
+            max_entries=LLM_CACHE_MAX_ENTRIES,
+            ttl=LLM_CACHE_TTL,
+            max_bytes=LLM_CACHE_MAX_BYTES,
+            sizeof=lambda value: len(value.encode('utf-8'))
+        )
+        self.disk = DiskCacheTier(LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_DISK_MAX_BYTES) \
+            if self.enabled and LLM_CACHE_PATH else None
+        self.disk_hits = 0
+        self.disk_misses = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+        value = await asyncio.to_thread(self.disk.get, key)
+        if value is None:
+            self.disk_misses += 1
+            return None
+        self.disk_hits += 1
+        self.memory.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        if not self.enabled:
+            return
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'memory': self.memory.stats(),
+            'disk': {'hits': self.disk_hits, 'misses': self.disk_misses} if self.disk else None
+        }
@@ -1,24 +1,55 @@
-from fastapi import FastAPI, HTTPException, Depends, Header, Body
+from fastapi import FastAPI, HTTPException, Depends, Header, Body, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from typing import Optional, List
-import os
+from fastapi.responses import StreamingResponse, FileResponse
+from typing import Optional, List, AsyncIterator, Awaitable, Callable, Union
+from urllib.parse import quote
+from contextlib import asynccontextmanager
+import json
 
 from models import (
-    ProjectCreate, ProjectResponse, GenerateOutlineRequest,
-    GenerateRequest, GenerateResponse, VersionCreate, VersionResponse,
+    ProjectCreate, ProjectResponse, ProjectSummaryResponse, GenerateOutlineRequest,
+    GenerateRequest, GenerateResponse, VersionCreate, VersionResponse, VersionSummaryResponse,
     CommentCreate, CommentResponse, FeedbackRequest, ExportRequest,
     AuthVerifyResponse, DocumentGenerateRequest, DocumentGenerateResponse,
     StructuredDocumentRequest, SectionResponse, ProjectContentResponse,
-    RefineRequest, SectionFeedbackRequest, SectionCommentRequest, ExportDocumentRequest
+    RefineRequest, SectionFeedbackRequest, SectionCommentRequest, ExportDocumentRequest,
+    JobSubmitResponse, JobResponse, SectionReorderRequest
 )
-from firestore_client import firestore_db
+from database import db
+from auth_client import token_verifier
 from ai_client import ai_client as gemini_client
-from exporter import exporter
+from generation import (
+    generate_project_sections, generate_pipelined_document, generation_plan,
+    is_generating, missing_sections
+)
+from jobs import job_manager, JobQueueFull, JobConflict
+from export_pool import export_pool, ExportQueueFull
+from exporter import export_filename, export_key
 from filters import sanitize_content
-from config import FRONTEND_URL
+from config import (
+    FRONTEND_URL, RESUME_GENERATION_ON_STARTUP, PIPELINED_DOCUMENT_GENERATION,
+    PROJECTS_PAGE_SIZE, PROJECTS_PAGE_MAX_SIZE, VERSIONS_PAGE_SIZE, VERSIONS_PAGE_MAX_SIZE
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Share one pooled OpenRouter client across all requests
+    await gemini_client.startup()
+    await job_manager.start()
+    export_pool.start()
+    if RESUME_GENERATION_ON_STARTUP:
+        try:
+            await resume_interrupted_generations()
+        except Exception as e:
+            print(f"WARNING: Resuming interrupted generations failed: {e}")
+    try:
+        yield
+    finally:
+        await job_manager.stop()
+        export_pool.stop()
+        await gemini_client.shutdown()
 
-app = FastAPI(title="DocForge API", version="1.0.0")
+app = FastAPI(title="DocForge API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,26 +62,97 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-async def get_current_user(authorization: Optional[str] = Header(None)):
-    """Verify Firebase token and extract user"""
+async def authenticate(authorization: Optional[str], check_revoked: bool = False) -> dict:
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header missing")
     
     try:
         token = authorization.replace("Bearer ", "")
-        decoded_token = await firestore_db.verify_token(token)
+        decoded_token = await token_verifier.verify_token(token, check_revoked=check_revoked)
         return decoded_token
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
 
+async def get_current_user(authorization: Optional[str] = Header(None)):
+    """Verify Firebase token and extract user (claims cached until the token expires)"""
+    return await authenticate(authorization)
+
+async def get_current_user_strict(authorization: Optional[str] = Header(None)):
+    """Verify Firebase token without the cache, rejecting revoked tokens"""
+    return await authenticate(authorization, check_revoked=True)
+
+async def get_owned_project(project_id: str, user = Depends(get_current_user)) -> dict:
+    """Resolve a project's cached metadata and check that the caller owns it"""
+    project = await db.get_project_meta(project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    if project['user_id'] != user['uid']:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return project
+
+def download_response(data: Union[bytes, str], filename: str, etag: str) -> Response:
+    """Attachment response for a rendered export; the ETag lets clients revalidate instead of re-downloading.
+
+    `data` is the export itself or, for spooled exports, the path of the file to stream.
+    """
+    headers = {
+        'Content-Disposition': f"attachment; filename*=utf-8''{quote(filename)}",
+        'ETag': f'"{etag}"',
+        'Cache-Control': 'private, no-cache'
+    }
+    if isinstance(data, str):
+        return FileResponse(data, media_type='application/octet-stream', headers=headers)
+    return Response(content=data, media_type='application/octet-stream', headers=headers)
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format a server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def stream_tokens(tokens: AsyncIterator[str], on_complete: Callable[[str], Awaitable[None]]) -> StreamingResponse:
+    """Forward LLM tokens as SSE and persist the full text once the stream ends"""
+    async def events():
+        parts = []
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield sse_event({'token': token})
+            content = ''.join(parts)
+            await on_complete(content)
+            yield sse_event({'content': content, 'status': 'success'}, event='done')
+        except Exception as e:
+            yield sse_event({'detail': str(e)}, event='error')
+    
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.get("/")
 async def root():
     return {"message": "DocForge API is running", "version": "1.0.0"}
 
+@app.get("/metrics")
+async def metrics(user = Depends(get_current_user)):
+    """Runtime counters for caches and schedulers"""
+    return {
+        'llm_cache': gemini_client.cache.stats(),
+        'llm_singleflight': gemini_client.inflight.stats(),
+        'llm_scheduler': gemini_client.scheduler.stats(),
+        'project_meta_cache': db.project_meta.stats(),
+        'auth_tokens': token_verifier.stats(),
+        'jobs': job_manager.stats(),
+        'exports': export_pool.stats()
+    }
+
 @app.post("/auth/verify", response_model=AuthVerifyResponse)
-async def verify_auth(user = Depends(get_current_user)):
+async def verify_auth(user = Depends(get_current_user_strict)):
     """Verify Firebase authentication token"""
     return AuthVerifyResponse(
         uid=user['uid'],
@@ -65,7 +167,7 @@ async def generate_outline(
 ):
     """Generate document outline or slide structure"""
     try:
-        outline = await gemini_client.generate_outline(request.description, request.type)
+        outline = await gemini_client.generate_outline(request.description, request.type, request.bypass_cache)
         return {"outline": outline}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -81,20 +183,33 @@ async def create_project(
         if project_data.get('outline'):
             project_data['outline'] = sanitize_content(project_data['outline'])
         
-        project_id = await firestore_db.create_project(user['uid'], project_data)
-        created_project = await firestore_db.get_project(project_id)
+        project_id = await db.create_project(user['uid'], project_data)
+        created_project = await db.get_project(project_id)
         return created_project
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/projects", response_model=List[ProjectResponse])
-async def get_projects(user = Depends(get_current_user)):
-    """Get all projects for the current user"""
+@app.get("/projects", response_model=List[ProjectSummaryResponse])
+async def get_projects(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    user = Depends(get_current_user)
+):
+    """List the current user's projects, most recently updated first.
+
+    Pass the X-Next-Cursor response header back as `cursor` to fetch the next page.
+    """
     try:
-        projects = await firestore_db.get_user_projects(user['uid'])
+        limit = max(1, min(limit or PROJECTS_PAGE_SIZE, PROJECTS_PAGE_MAX_SIZE))
+        projects, next_cursor = await db.get_user_projects(user['uid'], limit, cursor)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
         return projects
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -105,7 +220,7 @@ async def get_project(
 ):
     """Get a specific project"""
     try:
-        project = await firestore_db.get_project(project_id)
+        project = await db.get_project(project_id)
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         
@@ -122,17 +237,10 @@ async def get_project(
 async def generate_content(
     project_id: str,
     request: GenerateRequest,
-    user = Depends(get_current_user)
+    project: dict = Depends(get_owned_project)
 ):
     """Generate content for a project section"""
     try:
-        project = await firestore_db.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project['user_id'] != user['uid']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
         result = await gemini_client.generate_text(request.prompt, request.context)
         
         generated_text = sanitize_content(result['text'])
@@ -152,17 +260,11 @@ async def generate_content(
 async def save_version(
     project_id: str,
     version: VersionCreate,
+    project: dict = Depends(get_owned_project),
     user = Depends(get_current_user)
 ):
     """Save a new version of the project"""
     try:
-        project = await firestore_db.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project['user_id'] != user['uid']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
         sanitized_content = sanitize_content(version.content)
         
         metadata = {
@@ -171,11 +273,11 @@ async def save_version(
             'model': 'gemini-pro'
         }
         
-        version_id = await firestore_db.create_version(project_id, sanitized_content, metadata)
+        version_id = await db.create_version(project_id, sanitized_content, metadata)
         
-        await firestore_db.update_project(project_id, {'content': sanitized_content})
+        await db.update_project(project_id, {'content': sanitized_content})
         
-        saved_version = await firestore_db.get_version(project_id, version_id)
+        saved_version = await db.get_version(project_id, version_id)
         return saved_version
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -184,22 +286,27 @@ async def save_version(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/projects/{project_id}/versions", response_model=List[VersionResponse])
+@app.get("/projects/{project_id}/versions", response_model=List[VersionSummaryResponse])
 async def get_versions(
     project_id: str,
-    user = Depends(get_current_user)
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    project: dict = Depends(get_owned_project)
 ):
-    """Get all versions of a project"""
+    """List a project's versions newest first, without content.
+
+    Fetch a version's content from /projects/{id}/versions/{version_id}; pass
+    the X-Next-Cursor response header back as `cursor` for the next page.
+    """
     try:
-        project = await firestore_db.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project['user_id'] != user['uid']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        versions = await firestore_db.get_versions(project_id)
+        limit = max(1, min(limit or VERSIONS_PAGE_SIZE, VERSIONS_PAGE_MAX_SIZE))
+        versions, next_cursor = await db.get_versions(project_id, limit, cursor)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
         return versions
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
@@ -209,18 +316,11 @@ async def get_versions(
 async def get_version(
     project_id: str,
     version_id: str,
-    user = Depends(get_current_user)
+    project: dict = Depends(get_owned_project)
 ):
     """Get a specific version"""
     try:
-        project = await firestore_db.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project['user_id'] != user['uid']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        version = await firestore_db.get_version(project_id, version_id)
+        version = await db.get_version(project_id, version_id)
         if not version:
             raise HTTPException(status_code=404, detail="Version not found")
         
@@ -234,20 +334,14 @@ async def get_version(
 async def add_comment(
     project_id: str,
     comment: CommentCreate,
+    project: dict = Depends(get_owned_project),
     user = Depends(get_current_user)
 ):
     """Add a comment to a project"""
     try:
-        project = await firestore_db.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project['user_id'] != user['uid']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
         sanitized_text = sanitize_content(comment.text)
         
-        comment_id = await firestore_db.create_comment(project_id, user['uid'], sanitized_text)
+        comment_id = await db.create_comment(project_id, user['uid'], sanitized_text)
         
         saved_comment = {
             'id': comment_id,
@@ -267,18 +361,11 @@ async def add_comment(
 @app.get("/projects/{project_id}/comments", response_model=List[CommentResponse])
 async def get_comments(
     project_id: str,
-    user = Depends(get_current_user)
+    project: dict = Depends(get_owned_project)
 ):
     """Get all comments for a project"""
     try:
-        project = await firestore_db.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project['user_id'] != user['uid']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        comments = await firestore_db.get_comments(project_id)
+        comments = await db.get_comments(project_id)
         return comments
     except HTTPException:
         raise
@@ -289,18 +376,12 @@ async def get_comments(
 async def save_feedback(
     project_id: str,
     feedback: FeedbackRequest,
+    project: dict = Depends(get_owned_project),
     user = Depends(get_current_user)
 ):
     """Save user feedback (like/dislike)"""
     try:
-        project = await firestore_db.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project['user_id'] != user['uid']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        await firestore_db.save_feedback(project_id, user['uid'], feedback.type, feedback.content)
+        await db.save_feedback(project_id, user['uid'], feedback.type, feedback.content)
         
         return {"message": "Feedback saved successfully"}
     except HTTPException:
@@ -316,36 +397,26 @@ async def export_project(
 ):
     """Export project to .docx or .pptx"""
     try:
-        project = await firestore_db.get_project(project_id)
+        project = await db.get_project(project_id)
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         
         if project['user_id'] != user['uid']:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        if project['type'] == 'docx':
-            filepath = exporter.export_docx(
-                project['title'],
-                export_request.content,
-                project.get('outline')
-            )
-        elif project['type'] == 'pptx':
-            filepath = exporter.export_pptx(
-                project['title'],
-                export_request.content,
-                project.get('outline')
-            )
-        else:
+        if project['type'] not in ('docx', 'pptx'):
             raise HTTPException(status_code=400, detail="Invalid project type")
         
-        if not os.path.exists(filepath):
-            raise HTTPException(status_code=500, detail="Export failed")
-        
-        return FileResponse(
-            filepath,
-            media_type='application/octet-stream',
-            filename=os.path.basename(filepath)
+        etag, data = await export_pool.render_cached(
+            project['type'],
+            project['title'],
+            export_request.content,
+            project.get('outline')
         )
+        
+        return download_response(data, export_filename(project['title'], project['type']), etag)
+    except ExportQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
@@ -367,13 +438,43 @@ async def generate_outline_simple(
         # Generate outline using AI
         outline = await gemini_client.generate_outline(
             description=prompt,
-            doc_type=document_type
+            doc_type=document_type,
+            bypass_cache=bool(request.get('bypass_cache', False))
         )
         
         return {"outline": outline}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def build_document(request: DocumentGenerateRequest) -> DocumentGenerateResponse:
+    """Generate, sanitize and summarize a complete document"""
+    result = None
+    pipelined = PIPELINED_DOCUMENT_GENERATION if request.pipelined is None else request.pipelined
+    if pipelined:
+        # Sections generated concurrently; None when the outline can't be split
+        result = await generate_pipelined_document(request.prompt, request.document_type, request.outline)
+    
+    if result is None:
+        # Generate full document in a single completion
+        result = await gemini_client.generate_full_document(
+            prompt=request.prompt,
+            doc_type=request.document_type,
+            outline=request.outline
+        )
+    
+    # Sanitize content
+    sanitized_content = sanitize_content(result['content'])
+    
+    # Create preview text (first 500 chars)
+    preview_text = sanitized_content[:500] + "..." if len(sanitized_content) > 500 else sanitized_content
+    
+    return DocumentGenerateResponse(
+        content=sanitized_content,
+        outline_used=result['outline'],
+        preview_text=preview_text,
+        document_type=request.document_type
+    )
+
 @app.post("/generate-document", response_model=DocumentGenerateResponse)
 async def generate_document(
     request: DocumentGenerateRequest,
@@ -381,25 +482,7 @@ async def generate_document(
 ):
     """Generate a complete document from prompt"""
     try:
-        # Generate full document using Gemini
-        result = await gemini_client.generate_full_document(
-            prompt=request.prompt,
-            doc_type=request.document_type,
-            outline=request.outline
-        )
-        
-        # Sanitize content
-        sanitized_content = sanitize_content(result['content'])
-        
-        # Create preview text (first 500 chars)
-        preview_text = sanitized_content[:500] + "..." if len(sanitized_content) > 500 else sanitized_content
-        
-        return DocumentGenerateResponse(
-            content=sanitized_content,
-            outline_used=result['outline'],
-            preview_text=preview_text,
-            document_type=request.document_type
-        )
+        return await build_document(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -413,27 +496,35 @@ async def export_generated_document(
 ):
     """Export generated document to file"""
     try:
-        if document_type == 'docx':
-            filepath = exporter.export_docx(title, content, outline)
-        elif document_type == 'pptx':
-            filepath = exporter.export_pptx(title, content, outline)
-        else:
+        if document_type not in ('docx', 'pptx'):
             raise HTTPException(status_code=400, detail="Invalid document type")
         
-        if not os.path.exists(filepath):
-            raise HTTPException(status_code=500, detail="Export failed")
+        etag, data = await export_pool.render_cached(document_type, title, content, outline)
         
-        return FileResponse(
-            filepath,
-            media_type='application/octet-stream',
-            filename=os.path.basename(filepath)
-        )
+        return download_response(data, export_filename(title, document_type), etag)
+    except ExportQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # New endpoints for structured workflow
+async def create_structured_project(user_id: str, request: StructuredDocumentRequest) -> tuple:
+    """Create the project for a structured generation; returns (project_id, section titles)"""
+    items = request.structure.get('sections' if request.document_type == 'docx' else 'slides', [])
+    titles = [item['title'] for item in items]
+    
+    project_data = {
+        'title': request.prompt[:100],  # Use first 100 chars as title
+        'description': request.prompt,
+        'type': request.document_type,
+        'structure': request.structure,
+        'generation': generation_plan(titles, request.document_type, request.prompt)
+    }
+    project_id = await db.create_project(user_id, project_data)
+    return project_id, titles
+
 @app.post("/generate-structured-document")
 async def generate_structured_document(
     request: StructuredDocumentRequest,
@@ -441,74 +532,215 @@ async def generate_structured_document(
 ):
     """Generate document section-by-section based on user-defined structure"""
     try:
-        # Create project
-        project_data = {
-            'title': request.prompt[:100],  # Use first 100 chars as title
-            'description': request.prompt,
-            'type': request.document_type,
-            'structure': request.structure
-        }
-        project_id = await firestore_db.create_project(user['uid'], project_data)
-        
-        # Generate content for each section/slide
-        if request.document_type == 'docx':
-            sections = request.structure.get('sections', [])
-            for idx, section in enumerate(sections):
-                content = await gemini_client.generate_section_content(
-                    section['title'],
-                    'docx',
-                    request.prompt
-                )
-                section_data = {
-                    'title': section['title'],
-                    'content': content,
-                    'order': idx,
-                    'feedback': None,
-                    'comments': []
-                }
-                await firestore_db.create_section(project_id, section_data)
-        else:  # pptx
-            slides = request.structure.get('slides', [])
-            for idx, slide in enumerate(slides):
-                content = await gemini_client.generate_section_content(
-                    slide['title'],
-                    'pptx',
-                    request.prompt
-                )
-                section_data = {
-                    'title': slide['title'],
-                    'content': content,
-                    'order': idx,
-                    'feedback': None,
-                    'comments': []
-                }
-                await firestore_db.create_section(project_id, section_data)
+        project_id, titles = await create_structured_project(user['uid'], request)
+        
+        # Generate all sections/slides concurrently, saving each as it finishes
+        failed_sections = await generate_project_sections(
+            project_id,
+            titles,
+            request.document_type,
+            request.prompt,
+            request.concurrency,
+            request.bypass_cache,
+            request.batch_size
+        )
+        
+        if titles and len(failed_sections) == len(titles):
+            raise HTTPException(status_code=500, detail=f"Section generation failed: {failed_sections[0]['error']}")
+        
+        if failed_sections:
+            return {'project_id': project_id, 'status': 'partial', 'failed_sections': failed_sections}
         
         return {'project_id': project_id, 'status': 'success'}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/projects/{project_id}/content", response_model=ProjectContentResponse)
-async def get_project_content(
+# Background generation jobs
+def get_user_job(job_id: str, user: dict) -> dict:
+    job = job_manager.get(job_id)
+    if not job or job['user_id'] != user['uid']:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def submit_sections_job(user_id: str, project_id: str, titles: List[str], doc_type: str, context: str,
+                        concurrency: Optional[int] = None, bypass_cache: bool = False,
+                        batch_size: Optional[int] = None, orders: Optional[List[int]] = None) -> dict:
+    """Queue generation of the given project sections, tracking per-section progress on the job"""
+    orders = orders if orders is not None else list(range(len(titles)))
+    
+    async def run(job: dict):
+        progress = {entry['order']: entry for entry in job['sections']}
+        
+        async def track(result: dict):
+            entry = progress[result['order']]
+            if result['error']:
+                entry.update(status='failed', error=result['error'])
+                job['failed'] += 1
+            else:
+                entry.update(status='done', section_id=result['section_id'])
+                job['completed'] += 1
+        
+        failed_sections = await generate_project_sections(
+            project_id, titles, doc_type, context,
+            concurrency, bypass_cache, batch_size,
+            on_section=track,
+            orders=orders
+        )
+        if titles and len(failed_sections) == len(titles):
+            raise Exception(f"Section generation failed: {failed_sections[0]['error']}")
+        return {'project_id': project_id, 'failed_sections': failed_sections}
+    
+    return job_manager.submit(
+        'structured-document', user_id, run,
+        project_id=project_id,
+        total=len(titles),
+        sections=[{'order': order, 'title': title, 'status': 'pending', 'section_id': None, 'error': None}
+                  for order, title in zip(orders, titles)]
+    )
+
+async def resume_interrupted_generations():
+    """Queue the missing sections of every generation that was cut off by a restart"""
+    for project in await db.get_interrupted_generations():
+        if is_generating(project['id']) or job_manager.live_job(project['id']):
+            continue
+        plan = project['generation']
+        orders, titles = await missing_sections(project)
+        if not titles:
+            await db.update_project(project['id'], {'generation.status': 'complete'})
+            continue
+        try:
+            submit_sections_job(project['user_id'], project['id'], titles, plan['doc_type'],
+                                plan.get('context', ''), orders=orders)
+        except JobConflict:
+            continue  # Already resumed through /projects/{id}/resume-generation
+
+@app.post("/jobs/structured-document", response_model=JobSubmitResponse)
+async def submit_structured_document_job(
+    request: StructuredDocumentRequest,
+    user = Depends(get_current_user)
+):
+    """Queue section-by-section generation; the project can be opened while sections arrive"""
+    try:
+        job_manager.check_capacity()
+        project_id, titles = await create_structured_project(user['uid'], request)
+        try:
+            job = submit_sections_job(
+                user['uid'], project_id, titles, request.document_type, request.prompt,
+                request.concurrency, request.bypass_cache, request.batch_size
+            )
+        except JobQueueFull:
+            # The queue filled up meanwhile; keep the startup sweep from resuming a rejected generation
+            await db.update_project(project_id, {'generation.status': 'cancelled'})
+            raise
+        return JobSubmitResponse(job_id=job['id'], project_id=project_id, status=job['status'])
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/projects/{project_id}/resume-generation", response_model=JobSubmitResponse)
+async def resume_generation(
     project_id: str,
     user = Depends(get_current_user)
 ):
-    """Get all sections for a project"""
+    """Queue generation of only the planned sections that are still missing"""
     try:
-        project = await firestore_db.get_project(project_id)
+        project = await db.get_project(project_id)
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         
         if project['user_id'] != user['uid']:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        sections = await firestore_db.get_sections(project_id)
+        plan = project.get('generation')
+        if not plan:
+            raise HTTPException(status_code=409, detail="Project has no generation plan to resume")
+        
+        if is_generating(project_id) or job_manager.live_job(project_id):
+            raise HTTPException(status_code=409, detail="Generation is already running for this project")
+        
+        orders, titles = await missing_sections(project)
+        if not titles:
+            await db.update_project(project_id, {'generation.status': 'complete'})
+            raise HTTPException(status_code=409, detail="All planned sections have already been generated")
+        
+        job_manager.check_capacity()
+        await db.update_project(project_id, {'generation.status': 'running'})
+        try:
+            job = submit_sections_job(
+                user['uid'], project_id, titles, plan['doc_type'], plan.get('context', ''), orders=orders
+            )
+        except JobQueueFull:
+            await db.update_project(project_id, {'generation.status': plan.get('status', 'partial')})
+            raise
+        return JobSubmitResponse(job_id=job['id'], project_id=project_id, status=job['status'])
+    except HTTPException:
+        raise
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/jobs/document", response_model=JobSubmitResponse)
+async def submit_document_job(
+    request: DocumentGenerateRequest,
+    user = Depends(get_current_user)
+):
+    """Queue complete document generation; poll /jobs/{id} for the result"""
+    try:
+        async def run(job: dict):
+            document = await build_document(request)
+            return document.dict()
+        
+        job = job_manager.submit('document', user['uid'], run)
+        return JobSubmitResponse(job_id=job['id'], status=job['status'])
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    user = Depends(get_current_user)
+):
+    """Get job status and per-section progress"""
+    return get_user_job(job_id, user)
+
+@app.post("/jobs/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(
+    job_id: str,
+    user = Depends(get_current_user)
+):
+    """Cancel a queued or running job; sections already written are kept"""
+    job = get_user_job(job_id, user)
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    
+    if job['project_id']:
+        # Keep the startup sweep from resuming a generation the user stopped
+        await db.update_project(job['project_id'], {'generation.status': 'cancelled'})
+    return job
+
+@app.get("/projects/{project_id}/content", response_model=ProjectContentResponse)
+async def get_project_content(
+    project_id: str,
+    include_comments: bool = True,
+    project: dict = Depends(get_owned_project)
+):
+    """Get all sections for a project; pass include_comments=false to skip comment bodies"""
+    try:
+        sections = await db.get_sections(project_id, include_comments)
         
         # Convert comments to simple list of strings
         section_responses = []
         for section in sections:
             comments_list = []
-            if 'comments' in section and section['comments']:
+            if include_comments and section.get('comments'):
                 for comment in section['comments']:
                     if isinstance(comment, dict):
                         comments_list.append(comment.get('text', ''))
@@ -521,7 +753,8 @@ async def get_project_content(
                 content=section['content'],
                 order=section['order'],
                 feedback=section.get('feedback'),
-                comments=comments_list
+                comments=comments_list if include_comments else None,
+                comment_count=section.get('comment_count', len(comments_list) if include_comments else None)
             ))
         
         return ProjectContentResponse(sections=section_responses)
@@ -530,23 +763,38 @@ async def get_project_content(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.put("/projects/{project_id}/sections/order")
+async def reorder_sections(
+    project_id: str,
+    request: SectionReorderRequest,
+    project: dict = Depends(get_owned_project)
+):
+    """Reorder all sections of a project in batched writes"""
+    try:
+        sections = await db.get_sections(project_id, include_comments=False)
+        if sorted(request.section_ids) != sorted(section['id'] for section in sections):
+            raise HTTPException(status_code=400, detail="section_ids must list every section of the project exactly once")
+        
+        await db.update_sections(project_id, {
+            section_id: {'order': idx} for idx, section_id in enumerate(request.section_ids)
+        })
+        
+        return {'status': 'success'}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/projects/{project_id}/sections/{section_id}/refine")
 async def refine_section(
     project_id: str,
     section_id: str,
     request: RefineRequest,
-    user = Depends(get_current_user)
+    project: dict = Depends(get_owned_project)
 ):
     """Refine a specific section using AI"""
     try:
-        project = await firestore_db.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project['user_id'] != user['uid']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        section = await firestore_db.get_section(project_id, section_id)
+        section = await db.get_section(project_id, section_id)
         if not section:
             raise HTTPException(status_code=404, detail="Section not found")
         
@@ -558,7 +806,7 @@ async def refine_section(
         )
         
         # Update section
-        await firestore_db.update_section(project_id, section_id, {
+        await db.update_section(project_id, section_id, {
             'content': refined_content
         })
         
@@ -568,23 +816,69 @@ async def refine_section(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/projects/{project_id}/sections/{section_id}/refine/stream")
+async def refine_section_stream(
+    project_id: str,
+    section_id: str,
+    request: RefineRequest,
+    project: dict = Depends(get_owned_project)
+):
+    """Refine a specific section using AI, streaming tokens as server-sent events"""
+    try:
+        section = await db.get_section(project_id, section_id)
+        if not section:
+            raise HTTPException(status_code=404, detail="Section not found")
+        
+        async def save(content: str):
+            await db.update_section(project_id, section_id, {'content': content})
+        
+        tokens = gemini_client.stream_refine_section_content(
+            section['content'],
+            request.refinement_prompt,
+            project['type']
+        )
+        return stream_tokens(tokens, save)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/projects/{project_id}/sections/{section_id}/generate/stream")
+async def generate_section_stream(
+    project_id: str,
+    section_id: str,
+    project: dict = Depends(get_owned_project)
+):
+    """Regenerate a section from its title, streaming tokens as server-sent events"""
+    try:
+        section = await db.get_section(project_id, section_id)
+        if not section:
+            raise HTTPException(status_code=404, detail="Section not found")
+        
+        async def save(content: str):
+            await db.update_section(project_id, section_id, {'content': content})
+        
+        tokens = gemini_client.stream_section_content(
+            section['title'],
+            project['type'],
+            project.get('description', '')
+        )
+        return stream_tokens(tokens, save)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/projects/{project_id}/sections/{section_id}/feedback")
 async def save_section_feedback(
     project_id: str,
     section_id: str,
     request: SectionFeedbackRequest,
-    user = Depends(get_current_user)
+    project: dict = Depends(get_owned_project)
 ):
     """Save like/dislike feedback for a section"""
     try:
-        project = await firestore_db.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project['user_id'] != user['uid']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        await firestore_db.update_section(project_id, section_id, {
+        await db.update_section(project_id, section_id, {
             'feedback': request.feedback
         })
         
@@ -599,18 +893,12 @@ async def save_section_comment(
     project_id: str,
     section_id: str,
     request: SectionCommentRequest,
-    user = Depends(get_current_user)
+    project: dict = Depends(get_owned_project)
 ):
     """Save a comment on a section"""
     try:
-        project = await firestore_db.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project['user_id'] != user['uid']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        await firestore_db.add_section_comment(project_id, section_id, request.comment)
+        if not await db.add_section_comment(project_id, section_id, request.comment):
+            raise HTTPException(status_code=404, detail="Section not found")
         
         return {'status': 'success'}
     except HTTPException:
@@ -622,18 +910,16 @@ async def save_section_comment(
 async def export_project(
     project_id: str,
     document_type: str,
-    user = Depends(get_current_user)
+    if_none_match: Optional[str] = Header(None),
+    project: dict = Depends(get_owned_project)
 ):
-    """Export project with all sections to document"""
+    """Export project with all sections to document.
+
+    Unchanged documents are served from the export cache; a matching
+    If-None-Match gets 304 Not Modified.
+    """
     try:
-        project = await firestore_db.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project['user_id'] != user['uid']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        sections = await firestore_db.get_sections(project_id)
+        sections = await db.get_sections(project_id, include_comments=False)
         
         # Combine all sections into content
         content_parts = []
@@ -646,21 +932,19 @@ async def export_project(
         title = project.get('title', 'Generated Document')
         
         # Export to file
-        if document_type == 'docx':
-            filepath = exporter.export_docx(title, content, None)
-        elif document_type == 'pptx':
-            filepath = exporter.export_pptx(title, content, None)
-        else:
+        if document_type not in ('docx', 'pptx'):
             raise HTTPException(status_code=400, detail="Invalid document type")
         
-        if not os.path.exists(filepath):
-            raise HTTPException(status_code=500, detail="Export failed")
+        etag = export_key(document_type, title, content)
+        if if_none_match and (if_none_match.strip() == '*' or
+                              f'"{etag}"' in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]):
+            return Response(status_code=304, headers={'ETag': f'"{etag}"'})
         
-        return FileResponse(
-            filepath,
-            media_type='application/octet-stream',
-            filename=os.path.basename(filepath)
-        )
+        etag, data = await export_pool.render_cached(document_type, title, content)
+        
+        return download_response(data, export_filename(title, document_type), etag)
+    except ExportQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
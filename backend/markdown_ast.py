@@ -0,0 +1,101 @@
+import re
+from typing import List, NamedTuple, Tuple
+
+# Block kinds
+HEADING = 'heading'
+BULLET = 'bullet'
+NUMBERED = 'numbered'
+PARAGRAPH = 'paragraph'
+
+# Inline span styles
+TEXT = 'text'
+BOLD = 'bold'
+ITALIC = 'italic'
+CODE = 'code'
+
+# Deepest list nesting level; every 2 columns of indentation (a tab counts as 4) is one level
+MAX_LIST_LEVEL = 2
+
+# One match per non-blank (right-stripped) line: indentation, an optional block marker, then the text
+BLOCK_PATTERN = re.compile(
+    r'(?P<indent>[ \t]*)'
+    r'(?:(?P<hashes>#{1,6})[ \t]+'
+    r'|(?P<bullet>[-*+][ \t]+|•[ \t]*)'
+    r'|(?P<number>\d+)\.[ \t]+)?'
+    r'(?P<text>.*)'
+)
+
+# **bold**, *italic* / _italic_ and `code`; the leftmost marker wins, bold before italic.
+# The leading lookahead lets the scan skip plain characters without trying each alternative
+INLINE_PATTERN = re.compile(
+    r'(?=[*_`])(?:'
+    r'\*\*(?P<bold>.+?)\*\*'
+    r'|(?<!\*)\*(?!\*)(?P<italic>.+?)(?<!\*)\*(?!\*)'
+    r'|_(?P<underscore>.+?)_'
+    r'|`(?P<code>.+?)`)'
+)
+INLINE_MARKERS = frozenset('*_`')
+INLINE_STYLES = {'bold': BOLD, 'italic': ITALIC, 'underscore': ITALIC, 'code': CODE}
+
+Span = Tuple[str, str]
+
+class Block(NamedTuple):
+    """One line-level element of a parsed document.
+
+    `level` is the heading level (1-6) for headings and the nesting level
+    (0-MAX_LIST_LEVEL) for list items and paragraphs. `number` is the
+    written number of a numbered list item, 0 otherwise.
+    """
+    kind: str
+    level: int
+    spans: Tuple[Span, ...]
+    number: int = 0
+
+    @property
+    def text(self) -> str:
+        """The block's text with inline markup removed"""
+        if len(self.spans) == 1:
+            return self.spans[0][1]
+        return ''.join(text for _, text in self.spans)
+
+def parse_inline(text: str) -> Tuple[Span, ...]:
+    """Split text into (style, text) spans"""
+    if INLINE_MARKERS.isdisjoint(text):
+        return ((TEXT, text),)
+    spans = []
+    position = 0
+    for match in INLINE_PATTERN.finditer(text):
+        if match.start() > position:
+            spans.append((TEXT, text[position:match.start()]))
+        spans.append((INLINE_STYLES[match.lastgroup], match.group(match.lastgroup)))
+        position = match.end()
+    if position < len(text):
+        spans.append((TEXT, text[position:]))
+    return tuple(spans)
+
+def parse(content: str) -> List[Block]:
+    """Parse markdown into a flat list of blocks in document order; blank lines are dropped.
+
+    Recognises '#'-'######' headings, '-', '*', '+' and '•' bullets and '1.'
+    numbered items; every other line is a paragraph. Each line is matched once
+    against BLOCK_PATTERN and its text once against INLINE_PATTERN.
+    """
+    blocks = []
+    match_block = BLOCK_PATTERN.match
+    for line in content.splitlines():
+        line = line.rstrip()
+        if not line:
+            continue
+        match = match_block(line)
+        indent, hashes, bullet, number, text = match.group('indent', 'hashes', 'bullet', 'number', 'text')
+        if hashes:
+            blocks.append(Block(HEADING, len(hashes), parse_inline(text)))
+            continue
+        level = min(len(indent.expandtabs(4)) // 2, MAX_LIST_LEVEL) if indent else 0
+        if bullet:
+            blocks.append(Block(BULLET, level, parse_inline(text)))
+        elif number:
+            blocks.append(Block(NUMBERED, level, parse_inline(text), int(number)))
+        else:
+            blocks.append(Block(PARAGRAPH, level, parse_inline(text)))
+    return blocks
@@ -19,9 +19,18 @@ class ProjectResponse(BaseModel):
     updated_at: datetime
     user_id: str
 
+class ProjectSummaryResponse(BaseModel):
+    id: str
+    title: str
+    description: str
+    type: str
+    created_at: datetime
+    updated_at: datetime
+
 class GenerateOutlineRequest(BaseModel):
     description: str
     type: str
+    bypass_cache: bool = False  # Force a fresh completion instead of a cached one
 
 class GenerateRequest(BaseModel):
     prompt: str
@@ -39,6 +48,16 @@ class VersionResponse(BaseModel):
     version_number: int
     content: str
     created_at: datetime
+    size: Optional[int] = None
+    content_hash: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+class VersionSummaryResponse(BaseModel):
+    id: str
+    version_number: int
+    created_at: datetime
+    size: Optional[int] = None  # Content bytes; None for versions saved before it was recorded
+    content_hash: Optional[str] = None  # sha256 of the content
     metadata: Optional[Dict[str, Any]] = None
 
 class CommentCreate(BaseModel):
@@ -61,6 +80,7 @@ class DocumentGenerateRequest(BaseModel):
     prompt: str
     outline: Optional[str] = None
     document_type: str  # 'docx' or 'pptx'
+    pipelined: Optional[bool] = None  # One concurrent call per outline section; defaults to config
 
 class DocumentGenerateResponse(BaseModel):
     content: str
@@ -78,6 +98,9 @@ class StructuredDocumentRequest(BaseModel):
     prompt: str
     document_type: str  # 'docx' or 'pptx'
     structure: Dict[str, Any]  # For docx: {"sections": [...]}, For pptx: {"slides": [...]}
+    concurrency: Optional[int] = None  # Sections generated in parallel, capped server-side
+    bypass_cache: bool = False  # Force fresh completions instead of cached ones
+    batch_size: Optional[int] = None  # Sections per LLM call, capped server-side
 
 class SectionResponse(BaseModel):
     id: str
@@ -86,6 +109,7 @@ class SectionResponse(BaseModel):
     order: int
     feedback: Optional[str] = None
     comments: Optional[List[str]] = []
+    comment_count: Optional[int] = None
 
 class ProjectContentResponse(BaseModel):
     sections: List[SectionResponse]
@@ -93,12 +117,42 @@ class ProjectContentResponse(BaseModel):
 class RefineRequest(BaseModel):
     refinement_prompt: str
 
+class SectionReorderRequest(BaseModel):
+    section_ids: List[str]  # Every section of the project, in the new order
+
 class SectionFeedbackRequest(BaseModel):
     feedback: str  # 'like' or 'dislike'
 
 class SectionCommentRequest(BaseModel):
     comment: str
 
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    project_id: Optional[str] = None
+    status: str
+
+class JobSectionProgress(BaseModel):
+    order: int
+    title: str
+    status: str  # 'pending', 'done' or 'failed'
+    section_id: Optional[str] = None
+    error: Optional[str] = None
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str  # 'queued', 'running', 'succeeded', 'partial', 'failed', 'cancelled' or 'interrupted'
+    project_id: Optional[str] = None
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    sections: List[JobSectionProgress] = []
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 class ExportDocumentRequest(BaseModel):
     document_type: str  # 'docx' or 'pptx'
 
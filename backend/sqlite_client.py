@@ -0,0 +1,405 @@
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Optional, List, Dict, Tuple
+from storage import (
+    StorageBackend, decode_cursor, encode_cursor,
+    PROJECT_META_FIELDS, PROJECT_LIST_FIELDS, VERSION_LIST_FIELDS, SECTION_FIELDS
+)
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS projects ('
+    'id TEXT PRIMARY KEY, user_id TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL, '
+    'data TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS idx_projects_user_updated ON projects (user_id, updated_at DESC, id DESC)',
+    "CREATE INDEX IF NOT EXISTS idx_projects_generation_status "
+    "ON projects (json_extract(data, '$.generation.status'))",
+    'CREATE TABLE IF NOT EXISTS versions ('
+    'id TEXT PRIMARY KEY, project_id TEXT NOT NULL, version_number INTEGER NOT NULL, '
+    'created_at TEXT NOT NULL, data TEXT NOT NULL)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_versions_project_number ON versions (project_id, version_number)',
+    'CREATE TABLE IF NOT EXISTS sections ('
+    'id TEXT PRIMARY KEY, project_id TEXT NOT NULL, "order" INTEGER NOT NULL, data TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS idx_sections_project_order ON sections (project_id, "order")',
+    'CREATE TABLE IF NOT EXISTS comments ('
+    'id TEXT PRIMARY KEY, project_id TEXT NOT NULL, created_at TEXT NOT NULL, data TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS idx_comments_project_created ON comments (project_id, created_at)',
+    'CREATE TABLE IF NOT EXISTS feedback ('
+    'id TEXT PRIMARY KEY, project_id TEXT NOT NULL, created_at TEXT NOT NULL, data TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS idx_feedback_project ON feedback (project_id)',
+]
+
+def new_id() -> str:
+    return uuid.uuid4().hex
+
+def timestamp(value: datetime) -> str:
+    """Sortable column value for a datetime"""
+    return value.isoformat(timespec='microseconds')
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'$datetime': timestamp(value)}
+    if isinstance(value, bytes):
+        return {'$bytes': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+def _decode_object(obj: dict) -> Any:
+    if len(obj) == 1:
+        if '$datetime' in obj:
+            return datetime.fromisoformat(obj['$datetime'])
+        if '$bytes' in obj:
+            return base64.b64decode(obj['$bytes'])
+    return obj
+
+def dumps(doc: dict) -> str:
+    return json.dumps(doc, default=_encode_value, separators=(',', ':'))
+
+def loads(data: str) -> dict:
+    return json.loads(data, object_hook=_decode_object)
+
+def set_path(doc: dict, path: str, value: Any) -> None:
+    """Set a dotted field path ('generation.status') the way Firestore's update() does"""
+    keys = path.split('.')
+    target = doc
+    for key in keys[:-1]:
+        if not isinstance(target.get(key), dict):
+            target[key] = {}
+        target = target[key]
+    target[keys[-1]] = value
+
+def pick(doc: dict, fields: List[str]) -> dict:
+    return {field: doc[field] for field in fields if field in doc}
+
+class SQLiteDB(StorageBackend):
+    """Single-file storage backend with the same document model as FirestoreDB.
+
+    Each table keeps the indexed fields as columns and the whole document as
+    JSON. One connection in WAL mode is shared behind a lock and used from a
+    worker thread, so queries never block the event loop; each method runs as a
+    single transaction.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+
+    async def _run(self, fn: Callable, *args, write: bool = True) -> Any:
+        """Run fn(conn, *args) in a worker thread inside one transaction"""
+        def call():
+            with self._lock:
+                # IMMEDIATE takes the write lock up front so read-modify-write cannot race other processes
+                self._conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+                try:
+                    result = fn(self._conn, *args)
+                except BaseException:
+                    self._conn.execute('ROLLBACK')
+                    raise
+                self._conn.execute('COMMIT')
+                return result
+        return await asyncio.to_thread(call)
+
+    @staticmethod
+    def _load(conn: sqlite3.Connection, table: str, doc_id: str, project_id: str = None) -> Optional[dict]:
+        if project_id is None:
+            row = conn.execute(f'SELECT data FROM {table} WHERE id = ?', (doc_id,)).fetchone()
+        else:
+            row = conn.execute(f'SELECT data FROM {table} WHERE id = ? AND project_id = ?',
+                               (doc_id, project_id)).fetchone()
+        return loads(row[0]) if row else None
+
+    @staticmethod
+    def _save_project(conn: sqlite3.Connection, project_id: str, doc: dict) -> None:
+        conn.execute('UPDATE projects SET updated_at = ?, data = ? WHERE id = ?',
+                     (timestamp(doc['updated_at']), dumps(doc), project_id))
+
+    @staticmethod
+    def _save_section(conn: sqlite3.Connection, section_id: str, doc: dict) -> None:
+        conn.execute('UPDATE sections SET "order" = ?, data = ? WHERE id = ?',
+                     (doc.get('order', 0), dumps(doc), section_id))
+
+    # Projects
+    async def create_project(self, user_id: str, data: dict) -> str:
+        """Create a new project"""
+        project_id = new_id()
+        now = datetime.utcnow()
+        project_data = {
+            **data,
+            'user_id': user_id,
+            'created_at': now,
+            'updated_at': now,
+            'content': '',
+            'version_count': 0
+        }
+
+        def insert(conn):
+            conn.execute('INSERT INTO projects (id, user_id, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?)',
+                         (project_id, user_id, timestamp(now), timestamp(now), dumps(project_data)))
+        await self._run(insert)
+        return project_id
+
+    async def get_project(self, project_id: str) -> Optional[dict]:
+        """Get project by ID"""
+        data = await self._run(self._load, 'projects', project_id, write=False)
+        if data is not None:
+            data['id'] = project_id
+        return data
+
+    async def get_user_projects(self, user_id: str, limit: int,
+                                cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Get a page of a user's projects, most recently updated first"""
+        after = decode_cursor(cursor) if cursor else None
+
+        def query(conn):
+            if after:
+                return conn.execute(
+                    'SELECT id, data FROM projects WHERE user_id = ? AND (updated_at, id) < (?, ?) '
+                    'ORDER BY updated_at DESC, id DESC LIMIT ?',
+                    (user_id, timestamp(after['updated_at']), after['__name__'], limit + 1)).fetchall()
+            return conn.execute(
+                'SELECT id, data FROM projects WHERE user_id = ? ORDER BY updated_at DESC, id DESC LIMIT ?',
+                (user_id, limit + 1)).fetchall()
+
+        projects = [{**pick(loads(data), PROJECT_LIST_FIELDS), 'id': project_id}
+                    for project_id, data in await self._run(query, write=False)]
+        if len(projects) <= limit:
+            return projects, None
+        projects = projects[:limit]
+        last = projects[-1]
+        return projects, encode_cursor({'updated_at': last['updated_at'], '__name__': last['id']})
+
+    async def _read_project_meta(self, project_id: str) -> Optional[dict]:
+        data = await self._run(self._load, 'projects', project_id, write=False)
+        if data is None:
+            return None
+        return {**pick(data, PROJECT_META_FIELDS), 'id': project_id}
+
+    async def update_project(self, project_id: str, data: dict) -> None:
+        """Update project"""
+        def update(conn):
+            doc = self._load(conn, 'projects', project_id)
+            if doc is None:
+                raise ValueError(f"Project {project_id} not found")
+            for path, value in data.items():
+                set_path(doc, path, value)
+            doc['updated_at'] = datetime.utcnow()
+            self._save_project(conn, project_id, doc)
+        await self._run(update)
+        self.project_meta.invalidate(project_id)
+
+    async def get_interrupted_generations(self) -> List[dict]:
+        """Get projects whose generation was still running when last checkpointed"""
+        def query(conn):
+            return conn.execute(
+                "SELECT id, data FROM projects WHERE json_extract(data, '$.generation.status') = 'running'"
+            ).fetchall()
+        return [{**loads(data), 'id': project_id} for project_id, data in await self._run(query, write=False)]
+
+    # Versions
+    async def create_version(self, project_id: str, content: str, metadata: dict = None) -> str:
+        """Save a version of the project.
+
+        The delta base is chosen outside the write transaction, then the
+        transaction checks the project's latest version is unchanged before
+        inserting, and retries otherwise, so concurrent saves get distinct
+        numbers and a correct base.
+        """
+        version_id = new_id()
+
+        def read_state(conn):
+            doc = self._load(conn, 'projects', project_id)
+            if doc is None:
+                raise ValueError(f"Project {project_id} not found")
+            return doc.get('version_count') or 0, doc.get('latest_version')
+
+        def insert(conn, expected_count, latest, stored):
+            doc = self._load(conn, 'projects', project_id)
+            if (doc.get('version_count') or 0) != expected_count or doc.get('latest_version') != latest:
+                return False
+            now = datetime.utcnow()
+            version_number = expected_count + 1
+            version_data = {
+                'version_number': version_number,
+                **stored,
+                'created_at': now,
+                'metadata': metadata or {}
+            }
+            conn.execute('INSERT INTO versions (id, project_id, version_number, created_at, data) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         (version_id, project_id, version_number, timestamp(now), dumps(version_data)))
+            doc['version_count'] = version_number
+            doc['latest_version'] = {'id': version_id, 'chain_length': stored['chain_length']}
+            conn.execute('UPDATE projects SET data = ? WHERE id = ?', (dumps(doc), project_id))
+            return True
+
+        while True:
+            count, latest = await self._run(read_state, write=False)
+            stored = await self._encode_next_version(project_id, content, latest)
+            if await self._run(insert, count, latest, stored):
+                break
+        self.version_content.set((project_id, version_id), content)
+        return version_id
+
+    async def get_versions(self, project_id: str, limit: int,
+                           cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Get a page of version metadata, newest first, without version content"""
+        after = decode_cursor(cursor) if cursor else None
+
+        def query(conn):
+            if after:
+                return conn.execute(
+                    'SELECT id, data FROM versions WHERE project_id = ? AND version_number < ? '
+                    'ORDER BY version_number DESC LIMIT ?',
+                    (project_id, after['version_number'], limit + 1)).fetchall()
+            return conn.execute(
+                'SELECT id, data FROM versions WHERE project_id = ? ORDER BY version_number DESC LIMIT ?',
+                (project_id, limit + 1)).fetchall()
+
+        versions = [{**pick(loads(data), VERSION_LIST_FIELDS), 'id': version_id}
+                    for version_id, data in await self._run(query, write=False)]
+        if len(versions) <= limit:
+            return versions, None
+        versions = versions[:limit]
+        last = versions[-1]
+        return versions, encode_cursor({'version_number': last['version_number'], '__name__': last['id']})
+
+    async def _read_version(self, project_id: str, version_id: str) -> Optional[dict]:
+        return await self._run(self._load, 'versions', version_id, project_id, write=False)
+
+    # Project comments and feedback
+    async def create_comment(self, project_id: str, user_id: str, text: str) -> str:
+        """Add a comment to a project"""
+        comment_id = new_id()
+        now = datetime.utcnow()
+        comment_data = {
+            'user_id': user_id,
+            'text': text,
+            'created_at': now
+        }
+
+        def insert(conn):
+            conn.execute('INSERT INTO comments (id, project_id, created_at, data) VALUES (?, ?, ?, ?)',
+                         (comment_id, project_id, timestamp(now), dumps(comment_data)))
+        await self._run(insert)
+        return comment_id
+
+    async def get_comments(self, project_id: str) -> List[dict]:
+        """Get all comments for a project"""
+        def query(conn):
+            return conn.execute('SELECT id, data FROM comments WHERE project_id = ? ORDER BY created_at DESC',
+                                (project_id,)).fetchall()
+        return [{**loads(data), 'id': comment_id} for comment_id, data in await self._run(query, write=False)]
+
+    async def save_feedback(self, project_id: str, user_id: str, feedback_type: str, content: str) -> None:
+        """Save user feedback (like/dislike)"""
+        now = datetime.utcnow()
+        feedback_data = {
+            'user_id': user_id,
+            'type': feedback_type,
+            'content': content,
+            'created_at': now
+        }
+
+        def insert(conn):
+            conn.execute('INSERT INTO feedback (id, project_id, created_at, data) VALUES (?, ?, ?, ?)',
+                         (new_id(), project_id, timestamp(now), dumps(feedback_data)))
+        await self._run(insert)
+
+    # Sections
+    async def create_section(self, project_id: str, section_data: dict) -> str:
+        """Create a new section in a project"""
+        return (await self.create_sections(project_id, [section_data]))[0]
+
+    async def create_sections(self, project_id: str, sections: List[dict], checkpoint: bool = False) -> List[str]:
+        """Create many sections in one transaction; returns their ids in input order"""
+        now = datetime.utcnow()
+        section_ids = [section_data.get('id') or new_id() for section_data in sections]
+
+        def insert(conn):
+            conn.executemany('INSERT OR REPLACE INTO sections (id, project_id, "order", data) VALUES (?, ?, ?, ?)', [
+                (section_id, project_id, section_data.get('order', 0),
+                 dumps({**{key: value for key, value in section_data.items() if key != 'id'},
+                        'created_at': now, 'updated_at': now}))
+                for section_id, section_data in zip(section_ids, sections)
+            ])
+            if checkpoint:
+                doc = self._load(conn, 'projects', project_id)
+                if doc is None:
+                    raise ValueError(f"Project {project_id} not found")
+                plan = doc.setdefault('generation', {})
+                planned = [section_data['plan_index'] for section_data in sections]
+                plan['completed'] = plan.get('completed', []) + [
+                    index for index in planned if index not in plan.get('completed', [])]
+                plan['pending'] = [index for index in plan.get('pending', []) if index not in planned]
+                plan['updated_at'] = now
+                doc['updated_at'] = now
+                self._save_project(conn, project_id, doc)
+        await self._run(insert)
+        return section_ids
+
+    async def update_sections(self, project_id: str, updates: Dict[str, dict]) -> None:
+        """Update many sections (section_id -> fields) in one transaction"""
+        now = datetime.utcnow()
+
+        def update(conn):
+            for section_id, data in updates.items():
+                doc = self._load(conn, 'sections', section_id, project_id)
+                if doc is None:
+                    raise ValueError(f"Section {section_id} not found")
+                doc.update(data)
+                doc['updated_at'] = now
+                self._save_section(conn, section_id, doc)
+        await self._run(update)
+
+    async def get_sections(self, project_id: str, include_comments: bool = True) -> List[dict]:
+        """Get all sections for a project, ordered by order field"""
+        def query(conn):
+            return conn.execute('SELECT id, data FROM sections WHERE project_id = ? ORDER BY "order"',
+                                (project_id,)).fetchall()
+
+        sections = []
+        for section_id, data in await self._run(query, write=False):
+            section = loads(data)
+            if not include_comments:
+                section = pick(section, SECTION_FIELDS)
+            section['id'] = section_id
+            sections.append(section)
+        return sections
+
+    async def get_section(self, project_id: str, section_id: str) -> Optional[dict]:
+        """Get a specific section"""
+        data = await self._run(self._load, 'sections', section_id, project_id, write=False)
+        if data is not None:
+            data['id'] = section_id
+        return data
+
+    async def update_section(self, project_id: str, section_id: str, data: dict) -> None:
+        """Update section content and metadata"""
+        await self.update_sections(project_id, {section_id: data})
+
+    async def add_section_comment(self, project_id: str, section_id: str, comment: str) -> bool:
+        """Append a comment to a section atomically; returns False if the section does not exist"""
+        now = datetime.utcnow()
+
+        def append(conn):
+            doc = self._load(conn, 'sections', section_id, project_id)
+            if doc is None:
+                return False
+            doc['comments'] = doc.get('comments', []) + [{'text': comment, 'created_at': now}]
+            doc['comment_count'] = doc.get('comment_count', 0) + 1
+            doc['updated_at'] = now
+            self._save_section(conn, section_id, doc)
+            return True
+        return await self._run(append)
@@ -0,0 +1,206 @@
+import base64
+import hashlib
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple
+from cache import TTLCache
+from version_codec import encode_version, decode_chain, DELTA
+from config import PROJECT_META_CACHE_TTL, PROJECT_META_CACHE_MAX_ENTRIES, VERSION_CONTENT_CACHE_MAX_BYTES
+
+# Project fields cached for ownership checks and section-level operations
+PROJECT_META_FIELDS = ['user_id', 'type', 'title', 'description']
+
+# Project fields returned by the dashboard listing (no content or outline)
+PROJECT_LIST_FIELDS = ['title', 'description', 'type', 'created_at', 'updated_at', 'user_id']
+
+# Version fields returned by the history listing (no content)
+VERSION_LIST_FIELDS = ['version_number', 'size', 'content_hash', 'created_at', 'metadata']
+
+# Section fields read when comment bodies are not needed
+SECTION_FIELDS = ['title', 'content', 'order', 'plan_index', 'feedback', 'comment_count']
+
+def encode_cursor(values: dict) -> str:
+    """Opaque page cursor: the ordering values of the last document on a page"""
+    payload = {key: value.isoformat() if isinstance(value, datetime) else value for key, value in values.items()}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> dict:
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return {key: datetime.fromisoformat(value) if key.endswith('_at') else value
+                for key, value in values.items()}
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+class StorageBackend(ABC):
+    """Persistence used by the API. FirestoreDB and SQLiteDB implement it; STORAGE_BACKEND picks one.
+
+    Documents are plain dicts carrying their 'id'. update_project accepts
+    dotted field paths ('generation.status') like Firestore's update().
+    """
+
+    def __init__(self):
+        self.project_meta = TTLCache(max_entries=PROJECT_META_CACHE_MAX_ENTRIES, ttl=PROJECT_META_CACHE_TTL)
+        # Reconstructed version content, keyed by (project_id, version_id); versions are immutable
+        self.version_content = TTLCache(max_entries=1024, max_bytes=VERSION_CONTENT_CACHE_MAX_BYTES,
+                                        sizeof=lambda content: len(content))
+
+    # Projects
+    @abstractmethod
+    async def create_project(self, user_id: str, data: dict) -> str:
+        """Create a new project"""
+
+    @abstractmethod
+    async def get_project(self, project_id: str) -> Optional[dict]:
+        """Get project by ID"""
+
+    @abstractmethod
+    async def get_user_projects(self, user_id: str, limit: int,
+                                cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Get a page of a user's projects (PROJECT_LIST_FIELDS), most recently updated first.
+
+        Returns the projects and an opaque cursor for the next page (None on the last page).
+        """
+
+    @abstractmethod
+    async def _read_project_meta(self, project_id: str) -> Optional[dict]:
+        """Read PROJECT_META_FIELDS of a project, bypassing the cache"""
+
+    async def get_project_meta(self, project_id: str) -> Optional[dict]:
+        """Get a project's owner, type, title and description, served from a short TTL cache"""
+        meta = self.project_meta.get(project_id)
+        if meta is not None:
+            return meta
+        meta = await self._read_project_meta(project_id)
+        if meta is not None:
+            self.project_meta.set(project_id, meta)
+        return meta
+
+    @abstractmethod
+    async def update_project(self, project_id: str, data: dict) -> None:
+        """Update project fields and invalidate its cached metadata"""
+
+    @abstractmethod
+    async def get_interrupted_generations(self) -> List[dict]:
+        """Get projects whose generation was still running when last checkpointed"""
+
+    # Versions
+    @abstractmethod
+    async def create_version(self, project_id: str, content: str, metadata: dict = None) -> str:
+        """Save a version with the next version number, atomically"""
+
+    @abstractmethod
+    async def get_versions(self, project_id: str, limit: int,
+                           cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Get a page of version metadata (VERSION_LIST_FIELDS), newest first"""
+
+    @abstractmethod
+    async def _read_version(self, project_id: str, version_id: str) -> Optional[dict]:
+        """Read a stored version document as-is (deltas are not applied)"""
+
+    async def _encode_next_version(self, project_id: str, content: str, latest: Optional[dict]) -> dict:
+        """Storage fields for a version following `latest` ({'id', 'chain_length'} or None)"""
+        latest = latest or {}
+        base_content = await self._version_content(project_id, latest['id']) if latest.get('id') else None
+        stored = encode_version(content, base_content, latest.get('id'), latest.get('chain_length', 0))
+        stored['size'] = len(content.encode('utf-8'))
+        stored['content_hash'] = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return stored
+
+    async def _version_content(self, project_id: str, version_id: str, version: dict = None) -> Optional[str]:
+        """Reconstruct a version's content by walking back to its keyframe (or a cached ancestor)"""
+        cached = self.version_content.get((project_id, version_id))
+        if cached is not None:
+            return cached
+
+        chain = []
+        base_content = None
+        link_id = version_id
+        while True:
+            if version is None:
+                version = await self._read_version(project_id, link_id)
+                if version is None:
+                    if chain:
+                        raise ValueError(f"Version {link_id} is missing from the delta chain")
+                    return None
+            chain.append(version)
+            if version.get('encoding') != DELTA:
+                break
+            link_id = version['base_version_id']
+            base_content = self.version_content.get((project_id, link_id))
+            if base_content is not None:
+                break
+            version = None
+
+        chain.reverse()
+        content = decode_chain(chain, base_content)
+        expected_hash = chain[-1].get('content_hash')
+        if expected_hash and hashlib.sha256(content.encode('utf-8')).hexdigest() != expected_hash:
+            raise ValueError("Reconstructed version content does not match its hash")
+        self.version_content.set((project_id, version_id), content)
+        return content
+
+    async def get_version(self, project_id: str, version_id: str) -> Optional[dict]:
+        """Get a specific version, reconstructing its content from stored deltas"""
+        data = await self._read_version(project_id, version_id)
+        if data is None:
+            return None
+        content = await self._version_content(project_id, version_id, data)
+        for field in ('encoding', 'data', 'base_version_id', 'chain_length'):
+            data.pop(field, None)
+        data['content'] = content
+        data['id'] = version_id
+        return data
+
+    # Project comments and feedback
+    @abstractmethod
+    async def create_comment(self, project_id: str, user_id: str, text: str) -> str:
+        """Add a comment to a project"""
+
+    @abstractmethod
+    async def get_comments(self, project_id: str) -> List[dict]:
+        """Get all comments for a project, newest first"""
+
+    @abstractmethod
+    async def save_feedback(self, project_id: str, user_id: str, feedback_type: str, content: str) -> None:
+        """Save user feedback (like/dislike)"""
+
+    # Sections
+    @abstractmethod
+    async def create_section(self, project_id: str, section_data: dict) -> str:
+        """Create a new section in a project"""
+
+    @abstractmethod
+    async def create_sections(self, project_id: str, sections: List[dict], checkpoint: bool = False) -> List[str]:
+        """Create many sections; returns their ids in input order.
+
+        A section carrying an 'id' is written under that id, replacing any section
+        already stored there, so retrying a write that may have landed does not
+        duplicate sections.
+
+        With `checkpoint`, the sections' 'plan_index' entries are also moved from
+        pending to completed in the project's generation plan, atomically with
+        the section writes.
+        """
+
+    @abstractmethod
+    async def update_sections(self, project_id: str, updates: Dict[str, dict]) -> None:
+        """Update many sections (section_id -> fields)"""
+
+    @abstractmethod
+    async def get_sections(self, project_id: str, include_comments: bool = True) -> List[dict]:
+        """Get all sections for a project ordered by 'order'; without comments only SECTION_FIELDS"""
+
+    @abstractmethod
+    async def get_section(self, project_id: str, section_id: str) -> Optional[dict]:
+        """Get a specific section"""
+
+    @abstractmethod
+    async def update_section(self, project_id: str, section_id: str, data: dict) -> None:
+        """Update section content and metadata"""
+
+    @abstractmethod
+    async def add_section_comment(self, project_id: str, section_id: str, comment: str) -> bool:
+        """Append a comment to a section atomically; returns False if the section does not exist"""
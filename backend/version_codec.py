@@ -0,0 +1,90 @@
+import difflib
+import json
+import zlib
+from typing import List, Optional
+from config import VERSION_KEYFRAME_INTERVAL
+
+# Stored version encodings; versions saved before this module hold plain 'content'
+KEYFRAME = 'zlib'
+DELTA = 'zlib-delta'
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode('utf-8'), 6)
+
+def decompress_text(blob: bytes) -> str:
+    return zlib.decompress(blob).decode('utf-8')
+
+def encode_delta(base: str, target: str) -> bytes:
+    """Line-level delta turning `base` into `target`, zlib-compressed.
+
+    The delta is a JSON list of ops: [start, end] copies base lines[start:end],
+    a string is inserted verbatim.
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif tag in ('replace', 'insert'):
+            ops.append(''.join(target_lines[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(',', ':')).encode('utf-8'), 6)
+
+def apply_delta(base: str, delta: bytes) -> str:
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in json.loads(zlib.decompress(delta)):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(base_lines[op[0]:op[1]])
+    return ''.join(parts)
+
+def encode_version(content: str, base_content: Optional[str] = None, base_version_id: Optional[str] = None,
+                   base_chain_length: int = 0, keyframe_interval: int = VERSION_KEYFRAME_INTERVAL) -> dict:
+    """Storage fields for a new version.
+
+    Stores a delta against the previous version, or a full compressed keyframe
+    when there is no base, the chain since the last keyframe would reach
+    `keyframe_interval`, or the delta is no smaller than the keyframe. Reading
+    a version therefore never applies more than `keyframe_interval - 1` deltas.
+    """
+    keyframe = compress_text(content)
+    chain_length = base_chain_length + 1
+    if base_content is not None and base_version_id and chain_length < keyframe_interval:
+        delta = encode_delta(base_content, content)
+        if len(delta) < len(keyframe):
+            return {
+                'encoding': DELTA,
+                'data': delta,
+                'base_version_id': base_version_id,
+                'chain_length': chain_length,
+                'stored_size': len(delta)
+            }
+    return {
+        'encoding': KEYFRAME,
+        'data': keyframe,
+        'base_version_id': None,
+        'chain_length': 0,
+        'stored_size': len(keyframe)
+    }
+
+def decode_chain(chain: List[dict], base_content: Optional[str] = None) -> str:
+    """Content of the last version in `chain`, ordered oldest first.
+
+    The first entry must be a keyframe or legacy version, unless `base_content`
+    (the content of the first entry's base) is supplied.
+    """
+    content = base_content
+    for version in chain:
+        encoding = version.get('encoding')
+        if encoding == DELTA:
+            if content is None:
+                raise ValueError("Version chain does not start at a keyframe")
+            content = apply_delta(content, version['data'])
+        elif encoding == KEYFRAME:
+            content = decompress_text(version['data'])
+        else:
+            content = version.get('content', '')
+    return content
@@ -18,7 +18,8 @@ export default function Dashboard() {
   const fetchProjects = async () => {
     try {
       const headers = await getAuthHeaders();
-      const response = await axios.get(`${API_BASE_URL}/projects`, { headers });
+      // Only the six most recent projects are shown
+      const response = await axios.get(`${API_BASE_URL}/projects`, { headers, params: { limit: 6 } });
       setProjects(response.data);
     } catch (error) {
       console.error('Error fetching projects:', error);